@@ -1,34 +1,104 @@
+import re
+import threading
+
 import mysql.connector
-from mysql.connector import Error
+from mysql.connector import Error, pooling
 
 class DatabaseConnection:
-    def __init__(self, db_name, user, password, host='localhost', port=3306):
+    """Context manager yielding a cursor on a MySQL database.
+
+    Without pool_size every block opens and closes its own connection. With
+    pool_size, blocks share a mysql.connector pool keyed on every connection
+    and pool setting (host, port, user, password, database, pool_size,
+    pool_name, reset_session), so blocks with different settings never
+    share a pool. Entering checks a connection out and exiting hands it
+    back, resetting the session first when reset_session is True. pre_ping
+    checks (and if needed re-establishes) a pooled connection before use.
+    Either way the block commits on success and rolls back on error.
+    """
+
+    _pools = {}
+    _pools_lock = threading.Lock()
+
+    def __init__(self, db_name, user, password, host='localhost', port=3306,
+                 pool_size=None, pool_name=None, reset_session=True, pre_ping=False):
         self.db_name = db_name
         self.user = user
         self.password = password
         self.host = host
         self.port = port
+        self.pool_size = pool_size
+        self.pool_name = pool_name
+        self.reset_session = reset_session
+        self.pre_ping = pre_ping
+        self.conn = None
+        self.cursor = None
+
+    def _get_pool(self):
+        key = (self.host, self.port, self.user, self.password, self.db_name,
+               self.pool_size, self.pool_name, self.reset_session)
+        with self._pools_lock:
+            pool = self._pools.get(key)
+            if pool is None:
+                # Pool names allow a limited character set and 64 characters.
+                name = self.pool_name or re.sub(
+                    r'[^\w.:-]', '_', f"{self.user}@{self.host}:{self.port}.{self.db_name}")
+                pool = self._pools[key] = pooling.MySQLConnectionPool(
+                    pool_name=name[:64],
+                    pool_size=self.pool_size,
+                    pool_reset_session=self.reset_session,
+                    database=self.db_name,
+                    user=self.user,
+                    password=self.password,
+                    host=self.host,
+                    port=self.port
+                )
+            return pool
 
     def __enter__(self):
         print(f"Connecting to the MySQL database {self.db_name}...")
         try:
-            self.conn = mysql.connector.connect(
-                database=self.db_name,
-                user=self.user,
-                password=self.password,
-                host=self.host,
-                port=self.port
-            )
+            if self.pool_size:
+                self.conn = self._get_pool().get_connection()
+                if self.pre_ping:
+                    self.conn.ping(reconnect=True, attempts=3, delay=0)
+            else:
+                self.conn = mysql.connector.connect(
+                    database=self.db_name,
+                    user=self.user,
+                    password=self.password,
+                    host=self.host,
+                    port=self.port
+                )
             print(f"Connection to {self.db_name} successful.")
-            return self.conn.cursor()
+            self.cursor = self.conn.cursor()
+            return self.cursor
         except Error as e:
             print(f"Error connecting to database: {e}")
+            if self.conn is not None:
+                self.conn.close()
+                self.conn = None
             raise
 
     def __exit__(self, exc_type, exc_val, exc_tb):
-        if self.conn and self.conn.is_connected():
-            self.conn.commit()
+        if self.conn is None:
+            return
+        try:
+            if self.conn.is_connected():
+                # Rows the block did not fetch would block commit/rollback.
+                if self.conn.unread_result:
+                    self.conn.consume_results()
+                if exc_type is None:
+                    self.conn.commit()
+                else:
+                    self.conn.rollback()
+        finally:
+            if self.cursor is not None:
+                self.cursor.close()
+            # For pooled connections close() returns them to the pool.
             self.conn.close()
+            self.conn = None
+            self.cursor = None
             print(f"Connection to {self.db_name} closed.")
 
 
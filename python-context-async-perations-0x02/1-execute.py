@@ -1,14 +1,49 @@
 import sqlite3
+import time
+
+
+class QueryResult:
+  """Row count and timing of one execute/executemany call."""
+
+  def __init__(self, cursor, rowcount, elapsed):
+    self.cursor = cursor
+    self.rowcount = rowcount
+    self.elapsed = elapsed
+
+  def __repr__(self):
+    return f"QueryResult(rowcount={self.rowcount}, elapsed={self.elapsed:.6f})"
+
 
 class ExecuteQuery:
-  def __init__(self, query: str, params: tuple = ()):
+  """Run a query inside a `with` block.
+
+  By default each block opens (and closes) its own connection to
+  `database`. Pass `connection` to reuse an open one (it is committed or
+  rolled back but left open), or `pool`, any object whose connection()
+  returns a context manager lending a connection, to borrow from a pool.
+  """
+
+  def __init__(self, query: str, params: tuple = (), connection=None, pool=None,
+               database: str = 'user_db'):
     self.query = query
     self.params = params
-    
+    self.connection = connection
+    self.pool = pool
+    self.database = database
+    self.conn = None
+    self.result = None
+    self._lease = None
+
   def __enter__(self):
     print("Connecting to the database...")
     try:
-      self.conn = sqlite3.connect('user_db')
+      if self.connection is not None:
+        self.conn = self.connection
+      elif self.pool is not None:
+        self._lease = self.pool.connection()
+        self.conn = self._lease.__enter__()
+      else:
+        self.conn = sqlite3.connect(self.database)
       self.cursor = self.conn.cursor()
       print("Connection to the database successful.")
       return self
@@ -17,14 +52,23 @@ class ExecuteQuery:
       raise
 
   def __exit__(self, exc_type, exc_val, exc_tb):
-    if self.conn:
-      self.conn.commit()
-      self.conn.close()
-      print("Connection to the database closed.")
-      
+    if self._lease is not None:
+      lease, self._lease = self._lease, None
+      lease.__exit__(exc_type, exc_val, exc_tb)
+    elif self.conn:
+      if exc_type is None:
+        self.conn.commit()
+      else:
+        self.conn.rollback()
+      if self.connection is None:
+        self.conn.close()
+        print("Connection to the database closed.")
+
   def execute(self):
     try:
+      started = time.perf_counter()
       self.cursor.execute(self.query, self.params)
+      self.result = QueryResult(self.cursor, self.cursor.rowcount, time.perf_counter() - started)
       print("Query executed successfully.")
       return self.cursor
     except sqlite3.Error as e:
@@ -36,6 +80,35 @@ class ExecuteQuery:
       self.conn.rollback()
       return None
 
+  def iter_rows(self, batch_size: int = 500):
+    """Execute the query and yield its rows, fetching batch_size at a time."""
+    started = time.perf_counter()
+    cursor = self.conn.execute(self.query, self.params)
+    count = 0
+    try:
+      while True:
+        rows = cursor.fetchmany(batch_size)
+        if not rows:
+          break
+        count += len(rows)
+        yield from rows
+    finally:
+      self.result = QueryResult(cursor, count, time.perf_counter() - started)
+      cursor.close()
+
+  def executemany(self, seq_of_params):
+    """Run the query once per parameter set; returns a QueryResult."""
+    try:
+      started = time.perf_counter()
+      self.cursor.executemany(self.query, seq_of_params)
+      self.result = QueryResult(self.cursor, self.cursor.rowcount, time.perf_counter() - started)
+      print(f"Query executed for {self.result.rowcount} rows in {self.result.elapsed:.3f}s.")
+      return self.result
+    except sqlite3.Error as e:
+      print(f"An error occurred: {e}")
+      self.conn.rollback()
+      return None
+
 # Example usage
 query = "SELECT * FROM users WHERE age > ?"
 params = (25,)
@@ -1,22 +1,120 @@
 import aiosqlite
 import asyncio
+from contextlib import aclosing, asynccontextmanager
+
+
+class AioSQLitePool:
+    """Fixed-size pool of aiosqlite connections, opened lazily."""
+
+    def __init__(self, database="user_db", size=5):
+        self.database = database
+        self.size = size
+        self._idle = []
+        self._slots = asyncio.Semaphore(size)
+
+    @asynccontextmanager
+    async def connection(self):
+        """Lend a connection; it is closed instead of reused if the block fails."""
+        async with self._slots:
+            db = self._idle.pop() if self._idle else await aiosqlite.connect(self.database)
+            try:
+                yield db
+            except BaseException:
+                await db.close()
+                raise
+            self._idle.append(db)
+
+    async def close(self):
+        while self._idle:
+            await self._idle.pop().close()
+
+
+async def iter_row_chunks(db, sql, params=(), chunk_size=100):
+    """Yield the result of sql in lists of up to chunk_size rows as they are fetched."""
+    async with db.execute(sql, params) as cursor:
+        while True:
+            rows = await cursor.fetchmany(chunk_size)
+            if not rows:
+                break
+            yield rows
+
+
+async def iter_rows(db, sql, params=(), chunk_size=100):
+    """Yield the rows of sql one at a time, holding at most one chunk in memory."""
+    async with aclosing(iter_row_chunks(db, sql, params, chunk_size)) as chunks:
+        async for rows in chunks:
+            for row in rows:
+                yield row
+
+
+async def _fetch_all(db, sql, params):
+    async with db.execute(sql, params) as cursor:
+        return await cursor.fetchall()
+
+
+async def fan_out(queries, limit=10, timeout=None, pool=None, database="user_db"):
+    """Run many queries concurrently and yield (index, result) as each finishes.
+
+    queries holds SQL strings or (sql, params) tuples. At most `limit` run at
+    once, on connections from `pool` (a private pool of `limit` connections
+    if none is given). A query that fails or exceeds `timeout` seconds
+    yields its exception as the result instead of stopping the others.
+    Leaving the loop early cancels the queries still pending.
+    """
+    own_pool = pool is None
+    pool = pool or AioSQLitePool(database, size=limit)
+    semaphore = asyncio.Semaphore(limit)
+
+    async def run(index, query):
+        sql, params = (query, ()) if isinstance(query, str) else query
+        try:
+            async with semaphore, pool.connection() as db:
+                stopped = []
+                # Aborts the statement even if it only starts after interrupt().
+                await db.set_progress_handler(lambda: bool(stopped), 1000)
+                try:
+                    return index, await asyncio.wait_for(_fetch_all(db, sql, params), timeout)
+                except (asyncio.TimeoutError, asyncio.CancelledError):
+                    # Stop the statement still running in aiosqlite's thread;
+                    # otherwise closing the connection waits for it to finish.
+                    stopped.append(True)
+                    await db.interrupt()
+                    raise
+        except Exception as e:
+            return index, e
+
+    tasks = [asyncio.ensure_future(run(index, query)) for index, query in enumerate(queries)]
+    try:
+        for finished in asyncio.as_completed(tasks):
+            yield await finished
+    finally:
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+        if own_pool:
+            await pool.close()
+
+
+async def _print_rows(title, db, sql, params=()):
+    """Stream the rows of sql and print them under title as one block.
+
+    Rows are formatted as they arrive but printed only when the stream
+    ends, so tasks running concurrently never interleave their output.
+    """
+    lines = [f"\n{title}:"]
+    async for row in iter_rows(db, sql, params):
+        lines.append(str(row))
+    print("\n".join(lines))
+
 
 async def async_fetch_users():
     async with aiosqlite.connect("user_db") as db:
-        async with db.execute("SELECT * FROM users") as cursor:
-            rows = await cursor.fetchall()
-            print("\nAll Users:")
-            for row in rows:
-                print(row)
+        await _print_rows("All Users", db, "SELECT * FROM users")
     return
 
 async def async_fetch_older_users():
     async with aiosqlite.connect("user_db") as db:
-        async with db.execute("SELECT * FROM users WHERE age > 40") as cursor:
-            rows = await cursor.fetchall()
-            print("\nUsers older than 40:")
-            for row in rows:
-                print(row)
+        await _print_rows("Users older than 40", db, "SELECT * FROM users WHERE age > ?", (40,))
     return
 
 async def fetch_concurrently():
@@ -1,30 +1,169 @@
-import sqlite3
 import functools
-from datetime import datetime
+import logging
+import random
+import re
+import threading
+import time
+from collections import deque, namedtuple
+
+from db_pool import get_pool
+
+QueryRecord = namedtuple('QueryRecord', 'fingerprint duration rows error timestamp')
+
+_LITERALS = re.compile(r"'(?:[^']|'')*'|\b\d+(?:\.\d+)?\b")
+_IN_LISTS = re.compile(r"\(\s*\?(?:\s*,\s*\?)+\s*\)")
+
+
+@functools.lru_cache(maxsize=1024)
+def fingerprint(sql):
+  """SQL with literals replaced by ? and whitespace collapsed, for grouping."""
+  sql = _LITERALS.sub('?', sql)
+  sql = _IN_LISTS.sub('(?+)', sql)
+  return ' '.join(sql.split()).rstrip(';').rstrip()
+
+
+class LoggingSink:
+  """Send each record to a logging.Logger as one line."""
+
+  def __init__(self, logger=None, level=logging.INFO):
+    self.logger = logger or logging.getLogger('queries')
+    self.level = level
+
+  def __call__(self, record):
+    self.logger.log(self.level, "query=%r duration_ms=%.3f rows=%s error=%s",
+                    record.fingerprint, record.duration * 1000, record.rows, record.error)
+
+
+class RingBufferSink:
+  """Keep the most recent `size` records in memory."""
+
+  def __init__(self, size=1000):
+    self._records = deque(maxlen=size)
+
+  def __call__(self, record):
+    self._records.append(record)
+
+  def records(self):
+    return list(self._records)
+
+  def slowest(self, n=10):
+    return sorted(self._records, key=lambda record: record.duration, reverse=True)[:n]
+
+
+class HistogramSink:
+  """Prometheus-style duration histogram and error count per fingerprint."""
+
+  def __init__(self, buckets=(0.001, 0.005, 0.01, 0.05, 0.1, 0.5, 1.0, 5.0)):
+    self.buckets = tuple(sorted(buckets))
+    self._series = {}  # fingerprint -> [bucket counts..., +Inf count, sum, errors]
+    self._lock = threading.Lock()
+
+  def __call__(self, record):
+    query = record.fingerprint if record.fingerprint is not None else '<unknown>'
+    with self._lock:
+      series = self._series.get(query)
+      if series is None:
+        series = self._series[query] = [0] * (len(self.buckets) + 3)
+      for i, bound in enumerate(self.buckets):
+        if record.duration <= bound:
+          series[i] += 1
+      series[-3] += 1
+      series[-2] += record.duration
+      if record.error is not None:
+        series[-1] += 1
+
+  def render(self, name='db_query_duration_seconds'):
+    """Text exposition format, ready to serve from a /metrics endpoint."""
+    lines = [f"# TYPE {name} histogram"]
+    errors = []
+    with self._lock:
+      for query, series in sorted(self._series.items()):
+        label = query.replace('\\', '\\\\').replace('"', '\\"')
+        for bound, count in zip(self.buckets, series):
+          lines.append(f'{name}_bucket{{query="{label}",le="{bound}"}} {count}')
+        lines.append(f'{name}_bucket{{query="{label}",le="+Inf"}} {series[-3]}')
+        lines.append(f'{name}_sum{{query="{label}"}} {series[-2]}')
+        lines.append(f'{name}_count{{query="{label}"}} {series[-3]}')
+        errors.append(f'db_query_errors_total{{query="{label}"}} {series[-1]}')
+    if errors:
+      lines.append("# TYPE db_query_errors_total counter")
+      lines.extend(errors)
+    return '\n'.join(lines) + '\n'
+
+
+_enabled = True
+_sink = LoggingSink()
+_sample_rate = 1.0
+
+
+def configure(enabled=None, sink=None, sample_rate=None):
+  """Change where query records go and how many are kept (0.0-1.0)."""
+  global _enabled, _sink, _sample_rate
+  if enabled is not None:
+    _enabled = enabled
+  if sink is not None:
+    _sink = sink
+  if sample_rate is not None:
+    _sample_rate = sample_rate
+
+
+def _query_of(args, kwargs):
+  query = kwargs.get('query')
+  if query is None:
+    query = next((arg for arg in args if isinstance(arg, str)), None)
+  return query
+
+
+def _row_count(result):
+  """Rows a call returned: fetchall() lists are counted, a fetchone() row is 1."""
+  if isinstance(result, list):
+    return len(result)
+  if result is None:
+    return 0
+  if isinstance(result, tuple):
+    return 1
+  rowcount = getattr(result, 'rowcount', -1)
+  return rowcount if rowcount != -1 else None
+
+
+def _emit(query, started, rows, error):
+  duration = time.perf_counter() - started
+  record = QueryRecord(fingerprint(query) if query else None, duration, rows, error, time.time())
+  try:
+    _sink(record)
+  except Exception as e:
+    logging.getLogger('queries').warning("Query sink failed: %s", e)
+
 
 def log_queries(func):
+  """Record SQL fingerprint, duration, rows returned and error class per call.
+
+  Records go to the configured sink. When disabled, or when a call is not
+  sampled, the wrapper only checks a flag before calling func.
+  """
   @functools.wraps(func)
   def wrapper(*args, **kwargs):
-    query = kwargs.get('query')
-    if query is None and args:
-      query = args[0]
-    print(f"Query passed: {query}, at {datetime.now()}")
-    try:
+    if not _enabled or (_sample_rate < 1.0 and random.random() >= _sample_rate):
       return func(*args, **kwargs)
+    started = time.perf_counter()
+    try:
+      result = func(*args, **kwargs)
     except Exception as e:
-      print(f"Query failed: {e}")
+      _emit(_query_of(args, kwargs), started, None, type(e).__name__)
       raise
+    _emit(_query_of(args, kwargs), started, _row_count(result), None)
+    return result
   return wrapper
 
 
 @log_queries
 def fetch_all_users(query):
-  conn = sqlite3.connect('user_db')
-  cursor = conn.cursor()
-  cursor.execute(query)
-  results = cursor.fetchall()
-  conn.close()
-  return results
-
-users = fetch_all_users(query="SELECT * FROM users")
-print(users)
\ No newline at end of file
+  with get_pool().connection() as conn:
+    cursor = conn.cursor()
+    cursor.execute(query)
+    return cursor.fetchall()
+
+if __name__ == "__main__":
+  logging.basicConfig(level=logging.INFO)
+  users = fetch_all_users(query="SELECT * FROM users")
+  print(users)
@@ -1,10 +1,16 @@
-import sqlite3 
 import functools
 
-def with_db_connection(func):
+from db_pool import get_pool
+
+def with_db_connection(func=None, *, profile=None, statement_cache_size=None):
+  """Lend func a pooled connection; profile='performance' applies the tuned PRAGMAs."""
+  if func is None:
+    return functools.partial(with_db_connection, profile=profile,
+                             statement_cache_size=statement_cache_size)
+
   @functools.wraps(func)
   def wrapper(*args, **kwargs):
-    with sqlite3.connect('user_db') as conn:
+    with get_pool(profile=profile, statement_cache_size=statement_cache_size).connection() as conn:
         print("Connecting to the database...")
         if not conn:
             raise Exception("Failed to connect to the database.")
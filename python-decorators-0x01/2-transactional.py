@@ -1,10 +1,21 @@
-import sqlite3
 import functools
+import threading
+import time
+
+from db_pool import get_pool
+
+def with_db_connection(func=None, *, profile=None, statement_cache_size=None):
+  """Lend func a pooled connection; profile='performance' applies the tuned PRAGMAs."""
+  if func is None:
+    return functools.partial(with_db_connection, profile=profile,
+                             statement_cache_size=statement_cache_size)
 
-def with_db_connection(func):
   @functools.wraps(func)
   def wrapper(*args, **kwargs):
-    with sqlite3.connect('user_db') as conn:
+    batch = current_batch()
+    if batch is not None:
+      return func(batch.conn, *args, **kwargs)
+    with get_pool(profile=profile, statement_cache_size=statement_cache_size).connection() as conn:
         print("Connecting to the database...")
         if not conn:
             raise Exception("Failed to connect to the database.")
@@ -16,10 +27,97 @@ def with_db_connection(func):
             raise
   return wrapper
 
+_local = threading.local()
+
+
+def current_batch():
+    """The TransactionBatch active on this thread, if any."""
+    return getattr(_local, 'batch', None)
+
+
+class TransactionBatch:
+    """Group many @transactional calls into one transaction.
+
+    Inside `with TransactionBatch():` every @with_db_connection call on this
+    thread shares one pooled connection, and each @transactional call runs
+    in its own SAVEPOINT instead of committing. A call that raises is rolled
+    back to its savepoint, so the other rows in the batch survive; the
+    exception still reaches the caller. The batch commits every `max_size`
+    successful calls, once `max_interval` seconds have passed since the last
+    commit, and on a clean exit. Leaving the block with an exception rolls
+    back whatever has not been committed yet.
+    """
+
+    def __init__(self, max_size=500, max_interval=1.0, profile=None):
+        self.max_size = max_size
+        self.max_interval = max_interval
+        self.profile = profile
+        self.conn = None
+        self.pending = 0
+        self.committed = 0
+        self.failed = 0
+        self.flushes = 0
+        self._savepoints = 0
+        self._last_flush = time.monotonic()
+
+    def __enter__(self):
+        if current_batch() is not None:
+            raise RuntimeError("A TransactionBatch is already active on this thread.")
+        self._lease = get_pool(profile=self.profile).connection()
+        self.conn = self._lease.__enter__()
+        self._last_flush = time.monotonic()
+        _local.batch = self
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        _local.batch = None
+        try:
+            if exc_type is None:
+                self.flush()
+        finally:
+            lease, self._lease, self.conn = self._lease, None, None
+            lease.__exit__(exc_type, exc_val, exc_tb)
+        return False
+
+    def run(self, func, conn, args, kwargs):
+        """Run one transactional call inside a savepoint of the batch."""
+        if not conn.in_transaction:
+            # Without an outer transaction, RELEASE would commit each row.
+            conn.execute("BEGIN")
+        self._savepoints += 1
+        savepoint = f"batch_{self._savepoints}"
+        conn.execute(f"SAVEPOINT {savepoint}")
+        try:
+            result = func(conn, *args, **kwargs)
+        except Exception as e:
+            conn.execute(f"ROLLBACK TO {savepoint}")
+            conn.execute(f"RELEASE {savepoint}")
+            self.failed += 1
+            print(f"Transaction failed: {e}")
+            raise
+        conn.execute(f"RELEASE {savepoint}")
+        self.pending += 1
+        if (self.pending >= self.max_size
+                or time.monotonic() - self._last_flush >= self.max_interval):
+            self.flush()
+        return result
+
+    def flush(self):
+        """Commit everything run so far."""
+        self.conn.commit()
+        self.committed += self.pending
+        self.pending = 0
+        self.flushes += 1
+        self._last_flush = time.monotonic()
+
+
 def transactional(func):
     """Decorator to handle transactions for database operations."""
     @functools.wraps(func)
     def wrapper(conn, *args, **kwargs):
+        batch = current_batch()
+        if batch is not None and batch.conn is conn:
+            return batch.run(func, conn, args, kwargs)
         cursor = conn.cursor()
         try:
             result = func(conn, *args, **kwargs)
@@ -44,5 +142,14 @@ def update_user_name(conn, user_id, new_name):
         raise Exception(f"User with ID {user_id} not found.")
     print(f"User {user_id} name updated to {new_name}") 
 
-update = update_user_name(user_id=1, new_name='Jamal') # type: ignore
-print(update)
\ No newline at end of file
+if __name__ == "__main__":
+    update = update_user_name(user_id=1, new_name='Jamal') # type: ignore
+    print(update)
+
+    with TransactionBatch(max_size=100) as batch:
+        for user_id, new_name in [(1, 'Jamal'), (2, 'Amina'), (999, 'Nobody')]:
+            try:
+                update_user_name(user_id=user_id, new_name=new_name) # type: ignore
+            except Exception:
+                pass
+    print(f"Batch committed {batch.committed} updates, {batch.failed} failed.")
\ No newline at end of file
@@ -1,11 +1,20 @@
 import sqlite3
 import functools
+import random
+import threading
 import time
 
-def with_db_connection(func):
+from db_pool import get_pool
+
+def with_db_connection(func=None, *, profile=None, statement_cache_size=None):
+  """Lend func a pooled connection; profile='performance' applies the tuned PRAGMAs."""
+  if func is None:
+    return functools.partial(with_db_connection, profile=profile,
+                             statement_cache_size=statement_cache_size)
+
   @functools.wraps(func)
   def wrapper(*args, **kwargs):
-    with sqlite3.connect('user_db') as conn:
+    with get_pool(profile=profile, statement_cache_size=statement_cache_size).connection() as conn:
         print("Connecting to the database...")
         if not conn:
             raise Exception("Failed to connect to the database.")
@@ -17,18 +26,90 @@ def with_db_connection(func):
             raise
   return wrapper
 
-def retry_on_failure(retries=3, delay=1):
-    """Decorator to retry a function call on failure."""
+class RetryError(Exception):
+    """Raised when a call still fails after its retries; __cause__ is the last error."""
+
+
+RETRYABLE_MESSAGES = ('database is locked', 'database table is locked', 'database is busy',
+                      'disk i/o error', 'unable to open database')
+
+
+def is_retryable(exc):
+    """True for transient SQLite errors such as 'database is locked'."""
+    if isinstance(exc, sqlite3.OperationalError):
+        message = str(exc).lower()
+        return any(text in message for text in RETRYABLE_MESSAGES)
+    return isinstance(exc, (TimeoutError, ConnectionError))
+
+
+class RetryBudget:
+    """Token bucket capping how many retries the whole process may make.
+
+    Holds up to `burst` tokens and refills at `rate` tokens per second; each
+    retry spends one. When it is empty callers fail instead of piling more
+    load onto a struggling database.
+    """
+
+    def __init__(self, rate=10.0, burst=20):
+        self.rate = rate
+        self.burst = burst
+        self._tokens = float(burst)
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+        self.spent = 0
+        self.denied = 0
+
+    def try_acquire(self):
+        with self._lock:
+            now = time.monotonic()
+            self._tokens = min(self.burst, self._tokens + (now - self._updated) * self.rate)
+            self._updated = now
+            if self._tokens >= 1:
+                self._tokens -= 1
+                self.spent += 1
+                return True
+            self.denied += 1
+            return False
+
+
+retry_budget = RetryBudget()
+
+
+def retry_on_failure(retries=3, delay=1, max_delay=30, deadline=None,
+                     retry_if=is_retryable, budget=None):
+    """Decorator to retry a function call on transient failures.
+
+    Sleeps a random time in [0, min(max_delay, delay * 2**attempt)] between
+    attempts (exponential backoff with full jitter) so workers do not retry
+    in lockstep. Errors rejected by retry_if are raised immediately. Stops
+    early once `deadline` seconds have passed since the first attempt or the
+    shared retry budget runs dry, raising RetryError from the last error.
+    """
+    if retries < 1:
+        raise ValueError("retries must be at least 1.")
+
     def decorator(func):
         @functools.wraps(func)
         def wrapper(*args, **kwargs):
+            bucket = retry_budget if budget is None else budget
+            started = time.monotonic()
             for attempt in range(retries):
                 try:
                     return func(*args, **kwargs)
                 except Exception as e:
+                    if not retry_if(e):
+                        raise
                     print(f"Attempt {attempt + 1} failed: {e}")
-                    time.sleep(delay)
-            raise Exception(f"All {retries} attempts failed.")
+                    if attempt + 1 == retries:
+                        raise RetryError(f"All {retries} attempts failed.") from e
+                    pause = random.uniform(0, min(max_delay, delay * 2 ** attempt))
+                    if deadline is not None and time.monotonic() - started + pause > deadline:
+                        raise RetryError(
+                            f"Gave up after {attempt + 1} attempts: {deadline}s deadline reached.") from e
+                    if not bucket.try_acquire():
+                        raise RetryError(
+                            f"Gave up after {attempt + 1} attempts: retry budget exhausted.") from e
+                    time.sleep(pause)
         return wrapper
     return decorator
 
@@ -40,5 +121,6 @@ def fetch_users_with_retry(conn):
   cursor.execute("SELECT * FROM users")
   return cursor.fetchall()
 
-users = fetch_users_with_retry() # type: ignore
-print(users)
\ No newline at end of file
+if __name__ == "__main__":
+  users = fetch_users_with_retry() # type: ignore
+  print(users)
@@ -1,11 +1,26 @@
 import functools
+import hashlib
+import inspect
+import pickle
+import re
 import sqlite3
+import sys
+import threading
 import time
+from collections import OrderedDict
+from concurrent.futures import Future
+
+from db_pool import DATABASE, get_pool, pool_of
+
+def with_db_connection(func=None, *, profile=None, statement_cache_size=None):
+  """Lend func a pooled connection; profile='performance' applies the tuned PRAGMAs."""
+  if func is None:
+    return functools.partial(with_db_connection, profile=profile,
+                             statement_cache_size=statement_cache_size)
 
-def with_db_connection(func):
   @functools.wraps(func)
   def wrapper(*args, **kwargs):
-    with sqlite3.connect('user_db') as conn:
+    with get_pool(DATABASE, profile=profile, statement_cache_size=statement_cache_size).connection() as conn:
         print("Connecting to the database...")
         if not conn:
             raise Exception("Failed to connect to the database.")
@@ -17,32 +32,535 @@ def with_db_connection(func):
             raise
   return wrapper
 
-query_cache = {}
+_STRING_LITERAL = re.compile(r"('(?:[^']|'')*')")
+_TABLE_NAME = r'([A-Za-z_][\w.]*|"[^"]+"|`[^`]+`|\[[^\]]+\])'
+_READ_TABLES = re.compile(r'\b(?:FROM|JOIN)\s+' + _TABLE_NAME, re.IGNORECASE)
+_WRITE_TABLES = re.compile(
+  r'^\s*(?:(?:INSERT|REPLACE)(?:\s+OR\s+\w+)?\s+INTO|UPDATE(?:\s+OR\s+\w+)?|DELETE\s+FROM)\s+'
+  + _TABLE_NAME, re.IGNORECASE)
+
+def normalize_sql(sql):
+  """Collapse whitespace outside string literals and drop a trailing ';'."""
+  parts = _STRING_LITERAL.split(sql.strip())
+  for i in range(0, len(parts), 2):
+    parts[i] = re.sub(r'\s+', ' ', parts[i])
+  return ''.join(parts).strip().rstrip(';').rstrip()
+
+def _table_names(pattern, sql):
+  code = ' '.join(_STRING_LITERAL.split(sql)[::2])
+  tables = set()
+  for name in pattern.findall(code):
+    name = name.strip('"`[]').lower()
+    tables.add(name.split('.')[-1])
+  return tables
+
+def tables_read(sql):
+  """Tables a SELECT depends on (FROM/JOIN targets)."""
+  return _table_names(_READ_TABLES, sql)
+
+def tables_written(sql):
+  """Tables modified by an INSERT/REPLACE/UPDATE/DELETE statement."""
+  return _table_names(_WRITE_TABLES, sql)
+
+def _approx_size(value):
+  """Rough in-memory size of a cached result (containers plus their items)."""
+  size = sys.getsizeof(value)
+  if isinstance(value, (list, tuple, set, frozenset)):
+    size += sum(_approx_size(item) for item in value)
+  elif isinstance(value, dict):
+    size += sum(_approx_size(k) + _approx_size(v) for k, v in value.items())
+  return size
+
+
+class SQLiteCacheTier:
+  """On-disk cache tier shared by every process on the host.
+
+  Entries live in a WAL-mode SQLite file, values pickled with protocol 5.
+  Lifetimes are stored as wall-clock times so they survive restarts and
+  mean the same thing in every worker.
+  """
+
+  def __init__(self, path='query_cache.db', timeout=5.0):
+    self.path = path
+    self.timeout = timeout
+    self._local = threading.local()
+    self._connect().execute(
+      "CREATE TABLE IF NOT EXISTS query_cache ("
+      " key BLOB PRIMARY KEY, value BLOB NOT NULL,"
+      " expires_at REAL, stale_until REAL, tables TEXT NOT NULL)")
+
+  def _connect(self):
+    conn = getattr(self._local, 'conn', None)
+    if conn is None:
+      conn = sqlite3.connect(self.path, timeout=self.timeout, isolation_level=None)
+      conn.execute("PRAGMA journal_mode=WAL")
+      conn.execute("PRAGMA synchronous=NORMAL")
+      self._local.conn = conn
+    return conn
+
+  @staticmethod
+  def _digest(key):
+    return hashlib.blake2b(pickle.dumps(key, protocol=5), digest_size=20).digest()
+
+  def get(self, key):
+    """Return (value, expires_at, stale_until, tables) or None if absent/dead."""
+    digest = self._digest(key)
+    row = self._connect().execute(
+      "SELECT value, expires_at, stale_until, tables FROM query_cache WHERE key = ?",
+      (digest,)).fetchone()
+    if row is None:
+      return None
+    value, expires_at, stale_until, tables = row
+    if stale_until is not None and time.time() >= stale_until:
+      self._connect().execute("DELETE FROM query_cache WHERE key = ?", (digest,))
+      return None
+    return pickle.loads(value), expires_at, stale_until, frozenset(filter(None, tables.split(',')))
+
+  def set(self, key, value, expires_at, stale_until, tables):
+    self._connect().execute(
+      "INSERT OR REPLACE INTO query_cache VALUES (?, ?, ?, ?, ?)",
+      (self._digest(key), pickle.dumps(value, protocol=5), expires_at, stale_until,
+       ',' + ','.join(sorted(tables)) + ','))
+
+  def invalidate(self, key):
+    self._connect().execute("DELETE FROM query_cache WHERE key = ?", (self._digest(key),))
+
+  def invalidate_tables(self, tables):
+    conn = self._connect()
+    for table in tables:
+      conn.execute("DELETE FROM query_cache WHERE instr(tables, ?) > 0", (f",{table},",))
+
+  def clear(self):
+    self._connect().execute("DELETE FROM query_cache")
+
+
+class QueryCache:
+  """Thread-safe LRU cache with per-entry TTL and entry/byte bounds.
+
+  An optional second_tier (e.g. SQLiteCacheTier) is consulted on a local
+  miss and written through on set, so processes can share results.
+  """
+
+  def __init__(self, max_entries=128, max_bytes=None, ttl=60, second_tier=None):
+    self.max_entries = max_entries
+    self.max_bytes = max_bytes
+    self.ttl = ttl
+    self.second_tier = second_tier
+    self._entries = OrderedDict()  # key -> (value, expires_at, stale_until, size, tables)
+    self._by_table = {}  # table -> keys of entries that read it
+    self._bytes = 0
+    self._lock = threading.RLock()
+    self.hits = 0
+    self.misses = 0
+    self.evictions = 0
+    self.expirations = 0
+    self.stale_hits = 0
+    self.second_tier_hits = 0
+    self.second_tier_errors = 0
+
+  def get(self, key, default=None):
+    value, fresh = self.lookup(key)
+    return value if fresh else default
+
+  def lookup(self, key):
+    """Return (value, fresh).
+
+    An expired entry still inside its stale window comes back as
+    (value, False); an absent or fully expired one as (_MISSING, False).
+    """
+    with self._lock:
+      entry = self._entries.get(key)
+      if entry is not None:
+        value, expires_at, stale_until, _, _ = entry
+        now = time.monotonic()
+        if expires_at is None or now < expires_at:
+          self._entries.move_to_end(key)
+          self.hits += 1
+          return value, True
+        if now < stale_until:
+          self.stale_hits += 1
+          return value, False
+        self._remove(key)
+        self.expirations += 1
+    if self.second_tier is not None:
+      found = self._second_tier_call(self.second_tier.get, key)
+      if found is not None:
+        return self._promote(key, *found)
+    with self._lock:
+      self.misses += 1
+    return _MISSING, False
+
+  def _promote(self, key, value, expires_at, stale_until, tables):
+    """Copy a second-tier entry into memory, translating wall-clock lifetimes."""
+    offset = time.monotonic() - time.time()
+    expires_at = expires_at + offset if expires_at is not None else None
+    stale_until = stale_until + offset if stale_until is not None else None
+    with self._lock:
+      self.second_tier_hits += 1
+      self._store(key, value, expires_at, stale_until, tables)
+      if expires_at is not None and time.monotonic() >= expires_at:
+        self.stale_hits += 1
+        return value, False
+      self.hits += 1
+      return value, True
+
+  def _second_tier_call(self, method, *args):
+    """Run a second-tier operation; a broken tier must not break queries."""
+    try:
+      return method(*args)
+    except (sqlite3.Error, pickle.PickleError, OSError) as e:
+      with self._lock:
+        self.second_tier_errors += 1
+      print(f"Second-tier cache error: {e}")
+      return None
+
+  def set(self, key, value, ttl=None, tables=(), stale_ttl=0):
+    """Store value for ttl seconds, then keep serving it as stale for stale_ttl more."""
+    ttl = self.ttl if ttl is None else ttl
+    expires_at = time.monotonic() + ttl if ttl is not None else None
+    stale_until = expires_at + stale_ttl if expires_at is not None else None
+    with self._lock:
+      self._store(key, value, expires_at, stale_until, tables)
+    if self.second_tier is not None:
+      wall_expires = time.time() + ttl if ttl is not None else None
+      wall_stale = wall_expires + stale_ttl if wall_expires is not None else None
+      self._second_tier_call(self.second_tier.set, key, value, wall_expires, wall_stale, tables)
+
+  def _store(self, key, value, expires_at, stale_until, tables):
+    size = _approx_size(value) if self.max_bytes is not None else 0
+    with self._lock:
+      if key in self._entries:
+        self._remove(key)
+      if self.max_bytes is not None and size > self.max_bytes:
+        return
+      self._entries[key] = (value, expires_at, stale_until, size, frozenset(tables))
+      self._bytes += size
+      for table in tables:
+        self._by_table.setdefault(table, set()).add(key)
+      while len(self._entries) > self.max_entries or (
+          self.max_bytes is not None and self._bytes > self.max_bytes):
+        oldest = next(iter(self._entries))
+        self._remove(oldest)
+        self.evictions += 1
+
+  def invalidate(self, key):
+    with self._lock:
+      if key in self._entries:
+        self._remove(key)
+    if self.second_tier is not None:
+      self._second_tier_call(self.second_tier.invalidate, key)
+
+  def invalidate_tables(self, tables):
+    """Drop every entry that read any of the given tables; returns the count."""
+    with self._lock:
+      keys = set()
+      for table in tables:
+        keys |= self._by_table.get(table, set())
+      for key in keys:
+        self._remove(key)
+    if self.second_tier is not None:
+      self._second_tier_call(self.second_tier.invalidate_tables, tables)
+    return len(keys)
+
+  def clear(self):
+    with self._lock:
+      self._entries.clear()
+      self._by_table.clear()
+      self._bytes = 0
+    if self.second_tier is not None:
+      self._second_tier_call(self.second_tier.clear)
+
+  def stats(self):
+    with self._lock:
+      return {
+        'entries': len(self._entries),
+        'bytes': self._bytes,
+        'hits': self.hits,
+        'misses': self.misses,
+        'evictions': self.evictions,
+        'expirations': self.expirations,
+        'stale_hits': self.stale_hits,
+        'second_tier_hits': self.second_tier_hits,
+        'second_tier_errors': self.second_tier_errors,
+      }
+
+  def __len__(self):
+    return len(self._entries)
+
+  def _remove(self, key):
+    _, _, _, size, tables = self._entries.pop(key)
+    self._bytes -= size
+    for table in tables:
+      keys = self._by_table.get(table)
+      if keys is not None:
+        keys.discard(key)
+        if not keys:
+          del self._by_table[table]
+
+
+_MISSING = object()
+query_cache = QueryCache(max_entries=128, ttl=60)
+
+def _freeze(value):
+  """Hashable form of a bound argument (lists/dicts become tuples)."""
+  if isinstance(value, (list, tuple)):
+    return tuple(_freeze(item) for item in value)
+  if isinstance(value, dict):
+    return tuple(sorted((k, _freeze(v)) for k, v in value.items()))
+  return value
+
+def _cache_key(func, signature, args, kwargs):
+  """Build (function, normalized SQL, bound arguments) and the tables it reads.
+
+  The connection argument is left out; every other bound argument (query
+  parameters included) becomes part of the key.
+  """
+  bound = signature.bind(*args, **kwargs)
+  bound.apply_defaults()
+  query = None
+  params = []
+  for name, value in bound.arguments.items():
+    if isinstance(value, sqlite3.Connection) or hasattr(value, 'cursor'):
+      continue
+    if name == 'query' and isinstance(value, str):
+      query = normalize_sql(value)
+      value = query
+    params.append((name, _freeze(value)))
+  tables = tables_read(query) if query else ()
+  return (func.__qualname__, tuple(params)), query, tables
+
+_inflight = {}  # (id(cache), key) -> Future of the call recomputing it
+_inflight_lock = threading.Lock()
+
+def _claim(flight_key):
+  """Return (future, leader); only the leader should compute the value."""
+  with _inflight_lock:
+    future = _inflight.get(flight_key)
+    if future is not None:
+      return future, False
+    future = _inflight[flight_key] = Future()
+    return future, True
+
+def _settle(flight_key, future, compute):
+  """Run compute as the leader and publish its outcome to waiting callers."""
+  try:
+    result = compute()
+  except BaseException as e:
+    future.set_exception(e)
+    raise
+  else:
+    future.set_result(result)
+    return result
+  finally:
+    with _inflight_lock:
+      _inflight.pop(flight_key, None)
+
+def _settle_quietly(flight_key, future, compute):
+  try:
+    _settle(flight_key, future, compute)
+  except Exception as e:
+    print(f"Background cache refresh failed: {e}")
+
+def _track_reads(args, kwargs, proxy=None):
+  """Wrap connection arguments in proxies recording the tables their SQL reads.
+
+  Returns (args, kwargs, proxies).
+  """
+  proxy = proxy or _TrackingConnection
+  proxies = []
+
+  def wrap(value):
+    if isinstance(value, sqlite3.Connection) or hasattr(value, 'cursor'):
+      proxies.append(proxy(value, tables_read))
+      return proxies[-1]
+    return value
+  args = tuple(wrap(arg) for arg in args)
+  kwargs = {name: wrap(value) for name, value in kwargs.items()}
+  return args, kwargs, proxies
+
+def _tables_seen(proxies):
+  """Tables read through the proxies, or None if no SQL went through them."""
+  if not any(proxy.statements for proxy in proxies):
+    return None
+  return set().union(*(proxy.tables for proxy in proxies))
+
+def _call_tracking_reads(func, args, kwargs):
+  """Call func and return (result, tables its SQL read or None)."""
+  args, kwargs, proxies = _track_reads(args, kwargs)
+  return func(*args, **kwargs), _tables_seen(proxies)
+
+def _caller_pool(args, kwargs):
+  """The pool the caller's connection argument came from, else the default pool.
+
+  Must be looked up while the caller still holds the connection.
+  """
+  for value in (*args, *kwargs.values()):
+    if isinstance(value, sqlite3.Connection):
+      while isinstance(value, _TrackingConnection):
+        value = value._conn
+      pool = pool_of(value)
+      if pool is not None:
+        return pool
+  return get_pool(DATABASE)
+
+def _call_with_fresh_connection(pool, func, args, kwargs):
+  """_call_tracking_reads on a connection of func's own from pool.
+
+  The caller's connection is back in its pool by the time a refresh runs,
+  so an equivalent one (same pool, same tuning) is borrowed instead.
+  """
+  with pool.connection() as conn:
+    args = tuple(conn if isinstance(arg, sqlite3.Connection) else arg for arg in args)
+    kwargs = {name: conn if isinstance(value, sqlite3.Connection) else value
+              for name, value in kwargs.items()}
+    return _call_tracking_reads(func, args, kwargs)
+
+def cache_query(func=None, *, cache=None, ttl=None, stale_while_revalidate=0):
+  """Cache results by function, normalized SQL and bound parameters.
+
+  Usable as @cache_query or @cache_query(cache=..., ttl=...). Entries are
+  tagged with the tables their SQL reads, taken from a `query` argument and
+  from every statement run on the connection while computing the result,
+  so writes can invalidate them. A result whose tables are unknown (no
+  query argument and no SQL seen on the connection) is not cached.
+  Concurrent misses on one key are coalesced: a single caller runs the
+  query and the rest wait for its result. With stale_while_revalidate=N,
+  an entry up to N seconds past its TTL is served while one background
+  thread refreshes it.
+  """
+  if func is None:
+    return functools.partial(cache_query, cache=cache, ttl=ttl,
+                             stale_while_revalidate=stale_while_revalidate)
+  signature = inspect.signature(func)
 
-def cache_query(func):
   @functools.wraps(func)
   def wrapper(*args, **kwargs):
-    query = kwargs.get('query')
-    if query is None and args:
-      query = args[0]
+    store = query_cache if cache is None else cache
     try:
-      key = (func.__name__, query)
-      now = time.time()
-      if key in query_cache:
-        result, timestamp = query_cache[key]
-        if now - timestamp < 60:
-          print(f"Cache hit for query: {query}")
-          return result
-      else:
-        print(f"Cache miss for query: {query}")
-        result = func(*args, **kwargs)
-        query_cache[key] = (result, now)
+      key, query, tables = _cache_key(func, signature, args, kwargs)
+      result, fresh = store.lookup(key)
+      if fresh:
+        print(f"Cache hit for query: {query}")
+        return result
+      flight_key = (id(store), key)
+
+      def compute(call=_call_tracking_reads):
+        value, read = call(func, args, kwargs)
+        if read is None and not tables:
+          print(f"Not caching {func.__qualname__}: no SQL seen to tag it with tables")
+          return value
+        store.set(key, value, ttl, set(tables) | (read or set()), stale_while_revalidate)
+        return value
+
+      if result is not _MISSING:
+        print(f"Serving stale result for query: {query}")
+        future, leader = _claim(flight_key)
+        if leader:
+          refresh = functools.partial(
+            compute, functools.partial(_call_with_fresh_connection, _caller_pool(args, kwargs)))
+          threading.Thread(target=_settle_quietly, args=(flight_key, future, refresh),
+                           name="cache-refresh", daemon=True).start()
         return result
+      print(f"Cache miss for query: {query}")
+      future, leader = _claim(flight_key)
+      if not leader:
+        return future.result()
+      return _settle(flight_key, future, compute)
     except Exception as e:
       print(f"Error occurred while caching query: {e}")
       raise
   return wrapper
 
+class _TrackingCursor:
+  """Cursor proxy that reports each statement run through it to its connection proxy."""
+
+  def __init__(self, cursor, owner):
+    self._cursor = cursor
+    self._owner = owner
+
+  def execute(self, sql, *args):
+    self._owner.record(sql)
+    return self._chain(self._cursor.execute(sql, *args))
+
+  def executemany(self, sql, *args):
+    self._owner.record(sql)
+    return self._chain(self._cursor.executemany(sql, *args))
+
+  def _chain(self, result):
+    # sqlite3 returns the cursor itself; keep chained calls on the proxy.
+    return self if result is self._cursor else result
+
+  def __iter__(self):
+    return iter(self._cursor)
+
+  def __getattr__(self, name):
+    return getattr(self._cursor, name)
+
+class _TrackingConnection:
+  """Connection proxy that records the tables its statements touch.
+
+  extract picks the tables out of each statement: tables_written (the
+  default) for transactions, tables_read for cached reads.
+  """
+
+  def __init__(self, conn, extract=tables_written):
+    self._conn = conn
+    self._extract = extract
+    self.tables = set()
+    self.statements = 0
+
+  def record(self, sql):
+    self.statements += 1
+    self.tables |= self._extract(sql)
+
+  @property
+  def __class__(self):
+    # Keep isinstance(conn, sqlite3.Connection) true inside decorated functions.
+    return type(self._conn)
+
+  def cursor(self, *args, **kwargs):
+    return _TrackingCursor(self._conn.cursor(*args, **kwargs), self)
+
+  def execute(self, sql, *args):
+    self.record(sql)
+    return self._conn.execute(sql, *args)
+
+  def executemany(self, sql, *args):
+    self.record(sql)
+    return self._conn.executemany(sql, *args)
+
+  def __enter__(self):
+    self._conn.__enter__()
+    return self
+
+  def __exit__(self, *exc_info):
+    return self._conn.__exit__(*exc_info)
+
+  def __getattr__(self, name):
+    return getattr(self._conn, name)
+
+def transactional(func=None, *, cache=None):
+  """Commit on success, roll back on error, then evict cached reads of written tables."""
+  if func is None:
+    return functools.partial(transactional, cache=cache)
+
+  @functools.wraps(func)
+  def wrapper(conn, *args, **kwargs):
+    store = query_cache if cache is None else cache
+    tracked = _TrackingConnection(conn)
+    try:
+      result = func(tracked, *args, **kwargs)
+      conn.commit()
+    except Exception as e:
+      conn.rollback()
+      print(f"Transaction failed: {e}")
+      raise
+    if tracked.tables:
+      evicted = store.invalidate_tables(tracked.tables)
+      print(f"Invalidated {evicted} cached queries on {', '.join(sorted(tracked.tables))}")
+    return result
+  return wrapper
+
 @with_db_connection
 @cache_query
 def fetch_users_with_cache(conn, query):
@@ -51,8 +569,9 @@ def fetch_users_with_cache(conn, query):
     return cursor.fetchall()
   
   
-users = fetch_users_with_cache(query="SELECT * FROM users") # type: ignore
-print(users)
+if __name__ == "__main__":
+  users = fetch_users_with_cache(query="SELECT * FROM users") # type: ignore
+  print(users)
 
-users_again = fetch_users_with_cache(query="SELECT * FROM users") # type: ignore
-print(users_again)
+  users_again = fetch_users_with_cache(query="SELECT * FROM users") # type: ignore
+  print(users_again)
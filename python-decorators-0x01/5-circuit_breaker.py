@@ -0,0 +1,206 @@
+import sqlite3
+import functools
+import threading
+import time
+from collections import deque
+
+from db_pool import PoolTimeout, get_pool
+
+def with_db_connection(func=None, *, profile=None, statement_cache_size=None):
+  """Lend func a pooled connection; profile='performance' applies the tuned PRAGMAs."""
+  if func is None:
+    return functools.partial(with_db_connection, profile=profile,
+                             statement_cache_size=statement_cache_size)
+
+  @functools.wraps(func)
+  def wrapper(*args, **kwargs):
+    with get_pool(profile=profile, statement_cache_size=statement_cache_size).connection() as conn:
+        print("Connecting to the database...")
+        if not conn:
+            raise Exception("Failed to connect to the database.")
+        try:
+            print("Connection to db successful!")
+            return func(conn, *args, **kwargs)
+        except Exception as e:
+            print(f"Connection to db failed! {e}")
+            raise
+  return wrapper
+
+
+class CircuitOpenError(Exception):
+    """Raised instead of calling the function while the circuit is open."""
+
+
+CLOSED = 'closed'
+OPEN = 'open'
+HALF_OPEN = 'half_open'
+
+
+class CircuitBreaker:
+    """Failure-rate circuit breaker.
+
+    Outcomes are kept for the last `window` seconds. Once at least
+    `min_calls` were recorded and the share of failures reaches
+    `failure_threshold`, the circuit opens and calls fail immediately with
+    CircuitOpenError. After `reset_timeout` seconds it goes half-open and
+    lets `half_open_max_calls` probes through: a success closes it again,
+    a failure re-opens it. Only exceptions of the `failures` types count.
+    """
+
+    def __init__(self, failure_threshold=0.5, window=30.0, min_calls=10, reset_timeout=15.0,
+                 half_open_max_calls=1, failures=(sqlite3.Error, PoolTimeout, OSError)):
+        self.failure_threshold = failure_threshold
+        self.window = window
+        self.min_calls = min_calls
+        self.reset_timeout = reset_timeout
+        self.half_open_max_calls = half_open_max_calls
+        self.failures = failures
+        self._outcomes = deque()  # (timestamp, failed)
+        self._failed = 0
+        self._state = CLOSED
+        self._opened_at = 0.0
+        self._probes = 0
+        self._lock = threading.Lock()
+        self.calls = 0
+        self.successes = 0
+        self.failed_calls = 0
+        self.rejected = 0
+        self.times_opened = 0
+
+    @property
+    def state(self):
+        with self._lock:
+            self._maybe_half_open(time.monotonic())
+            return self._state
+
+    def stats(self):
+        with self._lock:
+            now = time.monotonic()
+            self._maybe_half_open(now)
+            self._trim(now)
+            return {
+                'state': self._state,
+                'calls': self.calls,
+                'successes': self.successes,
+                'failures': self.failed_calls,
+                'rejected': self.rejected,
+                'times_opened': self.times_opened,
+                'window_calls': len(self._outcomes),
+                'window_failure_rate': self._failed / len(self._outcomes) if self._outcomes else 0.0,
+            }
+
+    def before_call(self):
+        """Admit a call or raise CircuitOpenError; returns True for half-open probes."""
+        with self._lock:
+            self._maybe_half_open(time.monotonic())
+            if self._state == CLOSED:
+                self.calls += 1
+                return False
+            if self._state == HALF_OPEN and self._probes < self.half_open_max_calls:
+                self._probes += 1
+                self.calls += 1
+                return True
+            self.rejected += 1
+            retry_in = max(self._opened_at + self.reset_timeout - time.monotonic(), 0)
+        raise CircuitOpenError(f"Circuit is {self._state}; retry in {retry_in:.1f}s.")
+
+    def record(self, failed, probe=False):
+        with self._lock:
+            now = time.monotonic()
+            if failed:
+                self.failed_calls += 1
+            else:
+                self.successes += 1
+            if probe:
+                self._probes -= 1
+                if self._state != HALF_OPEN:
+                    return
+                if failed:
+                    self._open(now)
+                else:
+                    self._state = CLOSED
+                    self._outcomes.clear()
+                    self._failed = 0
+                return
+            if self._state != CLOSED:
+                return
+            self._outcomes.append((now, failed))
+            self._failed += failed
+            self._trim(now)
+            if (len(self._outcomes) >= self.min_calls
+                    and self._failed / len(self._outcomes) >= self.failure_threshold):
+                self._open(now)
+
+    def release_probe(self):
+        """Give back a half-open probe slot without changing the state."""
+        with self._lock:
+            self._probes -= 1
+
+    def reset(self):
+        with self._lock:
+            self._state = CLOSED
+            self._outcomes.clear()
+            self._failed = 0
+            self._probes = 0
+
+    def _open(self, now):
+        self._state = OPEN
+        self._opened_at = now
+        self.times_opened += 1
+        print(f"Circuit opened; failing fast for {self.reset_timeout}s.")
+
+    def _maybe_half_open(self, now):
+        if self._state == OPEN and now - self._opened_at >= self.reset_timeout:
+            self._state = HALF_OPEN
+            self._probes = 0
+
+    def _trim(self, now):
+        while self._outcomes and now - self._outcomes[0][0] > self.window:
+            _, failed = self._outcomes.popleft()
+            self._failed -= failed
+
+
+def circuit_breaker(breaker=None, **options):
+    """Decorator guarding a function with a CircuitBreaker.
+
+    Put it outside @with_db_connection so an open circuit rejects the call
+    before a connection is even checked out. The breaker is exposed as
+    wrapper.breaker for inspecting state and counters.
+    """
+    breaker = breaker if breaker is not None else CircuitBreaker(**options)
+
+    def decorator(func):
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            probe = breaker.before_call()
+            try:
+                result = func(*args, **kwargs)
+            except breaker.failures:
+                breaker.record(True, probe)
+                raise
+            except BaseException:
+                # Not a database failure: don't count it against the circuit,
+                # and don't let it close a half-open one either.
+                if probe:
+                    breaker.release_probe()
+                else:
+                    breaker.record(False)
+                raise
+            breaker.record(False, probe)
+            return result
+        wrapper.breaker = breaker
+        return wrapper
+    return decorator
+
+
+@circuit_breaker(min_calls=5, reset_timeout=10)
+@with_db_connection
+def fetch_users_with_breaker(conn):
+  cursor = conn.cursor()
+  cursor.execute("SELECT * FROM users")
+  return cursor.fetchall()
+
+if __name__ == "__main__":
+  users = fetch_users_with_breaker() # type: ignore
+  print(users)
+  print(fetch_users_with_breaker.breaker.stats())
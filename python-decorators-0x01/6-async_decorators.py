@@ -0,0 +1,346 @@
+import asyncio
+import functools
+import inspect
+import random
+import time
+from contextlib import asynccontextmanager
+
+import aiosqlite
+
+from db_pool import DATABASE, PROFILES, PoolTimeout
+
+log = __import__('0-log_queries')
+retry = __import__('3-retry_on_failure')
+cache = __import__('4-cache_query')
+
+
+class AsyncConnectionPool:
+  """Bounded pool of aiosqlite connections for one event loop.
+
+  At most max_size connections are lent at once; checkout waits up to
+  `timeout` seconds and pings idle connections with SELECT 1 before
+  lending them. profile names a db_pool.PROFILES entry (or is a dict of
+  PRAGMAs) applied to each new connection.
+
+  aiosqlite runs every connection on a non-daemon thread, so the process
+  cannot exit while one is open: close the pool when done, either with
+  `async with pool:` or by awaiting close() (close_async_pools() for the
+  shared pools).
+  """
+
+  def __init__(self, database=DATABASE, max_size=5, timeout=5.0, health_check=True,
+               profile=None, **connect_kwargs):
+    self.database = database
+    self.max_size = max_size
+    self.timeout = timeout
+    self.health_check = health_check
+    self.pragmas = PROFILES[profile] if isinstance(profile, str) else dict(profile or {})
+    self._connect_kwargs = connect_kwargs
+    self._idle = []
+    self._slots = None
+    self.loop = None
+
+  async def _open(self):
+    conn = await aiosqlite.connect(self.database, **self._connect_kwargs)
+    for name, value in self.pragmas.items():
+      await conn.execute(f"PRAGMA {name}={value}")
+    return conn
+
+  async def _healthy(self, conn):
+    if not self.health_check:
+      return True
+    try:
+      async with conn.execute("SELECT 1") as cursor:
+        await cursor.fetchone()
+      return True
+    except (aiosqlite.Error, ValueError):
+      return False
+
+  async def acquire(self, timeout=None):
+    if self._slots is None:
+      self._slots = asyncio.Semaphore(self.max_size)
+      self.loop = asyncio.get_running_loop()
+    timeout = self.timeout if timeout is None else timeout
+    try:
+      await asyncio.wait_for(self._slots.acquire(), timeout)
+    except asyncio.TimeoutError:
+      raise PoolTimeout(
+        f"No connection to {self.database} available within {timeout}s.") from None
+    try:
+      while self._idle:
+        conn = self._idle.pop()
+        if await self._healthy(conn):
+          return conn
+        await conn.close()
+      return await self._open()
+    except BaseException:
+      self._slots.release()
+      raise
+
+  async def release(self, conn, discard=False):
+    """Return a borrowed connection; discard=True closes it instead."""
+    try:
+      if discard:
+        await conn.close()
+      else:
+        self._idle.append(conn)
+    finally:
+      self._slots.release()
+
+  @asynccontextmanager
+  async def connection(self, timeout=None):
+    """Lend a connection, committing on success and rolling back on error."""
+    conn = await self.acquire(timeout)
+    try:
+      yield conn
+      await conn.commit()
+    except BaseException:
+      try:
+        await conn.rollback()
+      except (aiosqlite.Error, ValueError):
+        await self.release(conn, discard=True)
+      else:
+        await self.release(conn)
+      raise
+    await self.release(conn)
+
+  async def close(self):
+    """Close the idle connections; borrowed ones must be released first."""
+    while self._idle:
+      await self._idle.pop().close()
+
+  async def __aenter__(self):
+    return self
+
+  async def __aexit__(self, *exc_info):
+    await self.close()
+
+
+_async_pools = {}
+
+
+def get_async_pool(database=DATABASE, **options):
+  """Return the shared async pool for this event loop, database and options."""
+  options = {name: value for name, value in options.items() if value is not None}
+  key = (asyncio.get_running_loop(), database, tuple(sorted(options.items())))
+  pool = _async_pools.get(key)
+  if pool is None:
+    # Drop pools that belong to event loops which have since been closed.
+    for stale in [k for k in _async_pools if k[0].is_closed()]:
+      del _async_pools[stale]
+    pool = _async_pools[key] = AsyncConnectionPool(database, **options)
+  return pool
+
+
+async def close_async_pools():
+  """Close and forget every shared pool on the running event loop.
+
+  Call it before the loop ends, e.g. in a finally block around main().
+  """
+  loop = asyncio.get_running_loop()
+  for key in [key for key in _async_pools if key[0] is loop]:
+    await _async_pools.pop(key).close()
+
+
+def async_with_db_connection(func=None, *, profile=None):
+  """Lend an async function a pooled aiosqlite connection as its first argument."""
+  if func is None:
+    return functools.partial(async_with_db_connection, profile=profile)
+
+  @functools.wraps(func)
+  async def wrapper(*args, **kwargs):
+    async with get_async_pool(profile=profile).connection() as conn:
+      return await func(conn, *args, **kwargs)
+  return wrapper
+
+
+class _AsyncTrackingCursor(cache._TrackingCursor):
+  """aiosqlite flavour of the tracking cursor proxy."""
+
+  def __aiter__(self):
+    return self._cursor.__aiter__()
+
+
+class _AsyncCursorResult:
+  """cursor() result that can be awaited or used with `async with`, like aiosqlite's."""
+
+  def __init__(self, result, owner):
+    self._result = result
+    self._owner = owner
+    self._cursor = None
+
+  async def _open(self):
+    return _AsyncTrackingCursor(await self._result, self._owner)
+
+  def __await__(self):
+    return self._open().__await__()
+
+  async def __aenter__(self):
+    self._cursor = await self._open()
+    return self._cursor
+
+  async def __aexit__(self, *exc_info):
+    await self._cursor.close()
+
+
+class _AsyncTrackingConnection(cache._TrackingConnection):
+  """aiosqlite flavour of the tracking connection proxy."""
+
+  def cursor(self, *args, **kwargs):
+    return _AsyncCursorResult(self._conn.cursor(*args, **kwargs), self)
+
+
+def async_transactional(func=None, *, cache_store=None):
+  """Commit on success, roll back on error, then evict cached reads of written tables."""
+  if func is None:
+    return functools.partial(async_transactional, cache_store=cache_store)
+
+  @functools.wraps(func)
+  async def wrapper(conn, *args, **kwargs):
+    store = async_query_cache if cache_store is None else cache_store
+    tracked = _AsyncTrackingConnection(conn)
+    try:
+      result = await func(tracked, *args, **kwargs)
+      await conn.commit()
+    except Exception as e:
+      await conn.rollback()
+      print(f"Transaction failed: {e}")
+      raise
+    if tracked.tables:
+      store.invalidate_tables(tracked.tables)
+    return result
+  return wrapper
+
+
+def async_retry_on_failure(retries=3, delay=1, max_delay=30, deadline=None,
+                           retry_if=retry.is_retryable, budget=None):
+  """retry_on_failure for coroutines: same backoff, budget and errors, but awaits asyncio.sleep."""
+  if retries < 1:
+    raise ValueError("retries must be at least 1.")
+
+  def decorator(func):
+    @functools.wraps(func)
+    async def wrapper(*args, **kwargs):
+      bucket = retry.retry_budget if budget is None else budget
+      started = time.monotonic()
+      for attempt in range(retries):
+        try:
+          return await func(*args, **kwargs)
+        except Exception as e:
+          if not retry_if(e):
+            raise
+          print(f"Attempt {attempt + 1} failed: {e}")
+          if attempt + 1 == retries:
+            raise retry.RetryError(f"All {retries} attempts failed.") from e
+          pause = random.uniform(0, min(max_delay, delay * 2 ** attempt))
+          if deadline is not None and time.monotonic() - started + pause > deadline:
+            raise retry.RetryError(
+              f"Gave up after {attempt + 1} attempts: {deadline}s deadline reached.") from e
+          if not bucket.try_acquire():
+            raise retry.RetryError(
+              f"Gave up after {attempt + 1} attempts: retry budget exhausted.") from e
+          await asyncio.sleep(pause)
+    return wrapper
+  return decorator
+
+
+async_query_cache = cache.QueryCache(max_entries=128, ttl=60)
+_async_inflight = {}  # (loop, id(cache), key) -> Future of the call computing it
+
+
+class _LeaderCancelled(Exception):
+  """Set on a single-flight future whose leader was cancelled; waiters retry."""
+
+
+def async_cache_query(func=None, *, cache_store=None, ttl=None):
+  """cache_query for coroutines, with single-flight misses on the event loop.
+
+  Concurrent misses on one key await the same future instead of each
+  running the query. If the caller running it is cancelled, the waiters
+  are not: one of them takes over. Entries are tagged with the tables
+  read, as in cache_query.
+  """
+  if func is None:
+    return functools.partial(async_cache_query, cache_store=cache_store, ttl=ttl)
+  signature = inspect.signature(func)
+
+  @functools.wraps(func)
+  async def wrapper(*args, **kwargs):
+    store = async_query_cache if cache_store is None else cache_store
+    key, query, tables = cache._cache_key(func, signature, args, kwargs)
+    loop = asyncio.get_running_loop()
+    flight_key = (loop, id(store), key)
+    while True:
+      result = store.get(key, cache._MISSING)
+      if result is not cache._MISSING:
+        return result
+      pending = _async_inflight.get(flight_key)
+      if pending is None:
+        break
+      try:
+        return await asyncio.shield(pending)
+      except _LeaderCancelled:
+        continue  # compute it ourselves, or wait on whoever took over
+    future = _async_inflight[flight_key] = loop.create_future()
+    try:
+      call_args, call_kwargs, proxies = cache._track_reads(args, kwargs, _AsyncTrackingConnection)
+      result = await func(*call_args, **call_kwargs)
+      read = cache._tables_seen(proxies)
+      if read is not None or tables:
+        store.set(key, result, ttl, set(tables) | (read or set()))
+      future.set_result(result)
+      return result
+    except asyncio.CancelledError:
+      # Only this caller was cancelled; let the waiters retry instead.
+      future.set_exception(_LeaderCancelled())
+      future.exception()
+      raise
+    except BaseException as e:
+      future.set_exception(e)
+      # Mark retrieved so a failure nobody else awaited is not logged.
+      future.exception()
+      raise
+    finally:
+      _async_inflight.pop(flight_key, None)
+  return wrapper
+
+
+def async_log_queries(func):
+  """log_queries for coroutines; records go to the sink set with log.configure()."""
+  @functools.wraps(func)
+  async def wrapper(*args, **kwargs):
+    if not log._enabled or (log._sample_rate < 1.0 and random.random() >= log._sample_rate):
+      return await func(*args, **kwargs)
+    started = time.perf_counter()
+    try:
+      result = await func(*args, **kwargs)
+    except Exception as e:
+      log._emit(log._query_of(args, kwargs), started, None, type(e).__name__)
+      raise
+    log._emit(log._query_of(args, kwargs), started, log._row_count(result), None)
+    return result
+  return wrapper
+
+
+@async_with_db_connection
+@async_retry_on_failure(retries=3, delay=0.5)
+@async_cache_query
+async def fetch_users_async(conn, query):
+  async with conn.execute(query) as cursor:
+    return await cursor.fetchall()
+
+
+async def main():
+  try:
+    users, users_again = await asyncio.gather(
+      fetch_users_async(query="SELECT * FROM users"),
+      fetch_users_async(query="SELECT * FROM users"),
+    )
+    print(users)
+    print(async_query_cache.stats())
+  finally:
+    await close_async_pools()
+
+
+if __name__ == "__main__":
+  asyncio.run(main())
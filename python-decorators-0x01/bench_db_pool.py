@@ -0,0 +1,79 @@
+#!/usr/bin/env python3
+"""Per-query latency of fresh connections vs pooled and tuned connections.
+
+Usage: ./bench_db_pool.py [queries] [rows]
+
+Builds a throwaway users table in a temporary directory and runs the
+get_user_by_id lookup and a small write under each setup.
+"""
+import os
+import random
+import sqlite3
+import sys
+import tempfile
+import time
+
+from db_pool import ConnectionPool
+
+LOOKUP = "SELECT * FROM users WHERE user_id = ?"
+UPDATE = "UPDATE users SET name = ? WHERE user_id = ?"
+
+
+def build_database(path, rows):
+  conn = sqlite3.connect(path)
+  conn.execute("CREATE TABLE users (user_id INTEGER PRIMARY KEY, name TEXT, email TEXT, age INTEGER)")
+  conn.executemany("INSERT INTO users VALUES (?, ?, ?, ?)",
+                   ((i, f"user{i}", f"user{i}@example.com", 18 + i % 60) for i in range(1, rows + 1)))
+  conn.commit()
+  conn.close()
+
+
+def fresh_connection(path):
+  def run(sql, params):
+    with sqlite3.connect(path) as conn:
+      conn.execute(sql, params).fetchall()
+    # sqlite3's context manager does not close the connection.
+    conn.close()
+  return run
+
+
+def pooled(path, **options):
+  pool = ConnectionPool(path, **options)
+
+  def run(sql, params):
+    with pool.connection() as conn:
+      conn.execute(sql, params).fetchall()
+  return run
+
+
+def measure(run, sql, make_params, queries):
+  start = time.perf_counter()
+  for _ in range(queries):
+    run(sql, make_params())
+  return (time.perf_counter() - start) / queries * 1e6
+
+
+def main():
+  queries = int(sys.argv[1]) if len(sys.argv) > 1 else 5000
+  rows = int(sys.argv[2]) if len(sys.argv) > 2 else 10000
+  setups = (
+    ('fresh connection', lambda path: fresh_connection(path)),
+    ('pooled, no stmt cache', lambda path: pooled(path, statement_cache_size=0)),
+    ('pooled', lambda path: pooled(path)),
+    ('pooled + performance', lambda path: pooled(path, profile='performance')),
+  )
+  lookup_params = lambda: (random.randint(1, rows),)
+  update_params = lambda: (f"renamed{random.random()}", random.randint(1, rows))
+  print(f"{'setup':<24} {'lookup us':>10} {'update us':>10}")
+  for name, make in setups:
+    with tempfile.TemporaryDirectory() as tmp:
+      path = os.path.join(tmp, 'user_db')
+      build_database(path, rows)
+      run = make(path)
+      lookup = measure(run, LOOKUP, lookup_params, queries)
+      update = measure(run, UPDATE, update_params, max(queries // 5, 1))
+    print(f"{name:<24} {lookup:>10.1f} {update:>10.1f}")
+
+
+if __name__ == "__main__":
+  main()
@@ -0,0 +1,220 @@
+import sqlite3
+import threading
+import time
+from contextlib import contextmanager
+
+DATABASE = 'user_db'
+
+# PRAGMAs applied to every new connection, by profile name.
+PROFILES = {
+  'default': {},
+  'performance': {
+    'journal_mode': 'WAL',
+    'synchronous': 'NORMAL',
+    'mmap_size': 256 * 1024 * 1024,
+    'cache_size': -64 * 1024,  # negative means KiB, i.e. 64 MiB
+    'temp_store': 'MEMORY',
+  },
+}
+
+
+class PoolTimeout(Exception):
+  """Raised when no connection could be checked out before the timeout."""
+
+
+_lent = {}  # id(conn) -> pool, for connections currently checked out
+
+
+def pool_of(conn):
+  """The pool a checked-out connection was borrowed from, or None."""
+  return _lent.get(id(conn))
+
+
+class ConnectionPool:
+  """Bounded pool of sqlite3 connections.
+
+  min_size connections are opened up front and at most max_size exist at
+  once. Checkout waits up to `timeout` seconds for a free slot and, when
+  health_check is on, pings the connection with SELECT 1 before lending it.
+
+  With check_same_thread=True (sqlite3's default) a connection is only
+  ever lent to the thread that opened it; idle connections owned by other
+  threads are retired to make room rather than shared. With
+  check_same_thread=False any thread may borrow any idle connection, and
+  the pool guarantees a connection is used by one borrower at a time.
+
+  statement_cache_size sets how many prepared statements each connection
+  keeps, and profile (a PROFILES name or a dict of PRAGMAs) tunes every
+  connection as it is opened.
+  """
+
+  def __init__(self, database=DATABASE, min_size=1, max_size=5, timeout=5.0,
+               check_same_thread=True, health_check=True, statement_cache_size=128,
+               profile=None, **connect_kwargs):
+    if not 0 <= min_size <= max_size:
+      raise ValueError("Pool sizes must satisfy 0 <= min_size <= max_size.")
+    self.database = database
+    self.min_size = min_size
+    self.max_size = max_size
+    self.timeout = timeout
+    self.check_same_thread = check_same_thread
+    self.health_check = health_check
+    self.statement_cache_size = statement_cache_size
+    self.pragmas = PROFILES[profile] if isinstance(profile, str) else dict(profile or {})
+    self._connect_kwargs = connect_kwargs
+    self._idle = {}  # owning thread id (None when shareable) -> [connections]
+    self._size = 0
+    self._cond = threading.Condition()
+    self.checkouts = 0
+    self.created = 0
+    self.discarded = 0
+    self.waits = 0
+    for _ in range(min_size):
+      conn = self._open()
+      self._idle.setdefault(self._owner(), []).append(conn)
+      self._size += 1
+
+  def _owner(self):
+    return threading.get_ident() if self.check_same_thread else None
+
+  def _open(self):
+    conn = sqlite3.connect(self.database, check_same_thread=self.check_same_thread,
+                           cached_statements=self.statement_cache_size,
+                           **self._connect_kwargs)
+    for name, value in self.pragmas.items():
+      conn.execute(f"PRAGMA {name}={value}")
+    with self._cond:
+      self.created += 1
+    return conn
+
+  def _healthy(self, conn):
+    if not self.health_check:
+      return True
+    try:
+      conn.execute("SELECT 1").fetchone()
+      return True
+    except sqlite3.Error:
+      return False
+
+  def _retire_foreign_idle(self):
+    """Free a slot held by another thread's idle connection, if any."""
+    for owner, conns in self._idle.items():
+      if owner != self._owner() and conns:
+        # It cannot be closed from this thread; dropping it lets it be
+        # finalized without the cross-thread check.
+        conns.pop()
+        self._size -= 1
+        self.discarded += 1
+        return True
+    return False
+
+  def acquire(self, timeout=None):
+    timeout = self.timeout if timeout is None else timeout
+    deadline = time.monotonic() + timeout
+    while True:
+      with self._cond:
+        while True:
+          idle = self._idle.get(self._owner())
+          if idle:
+            conn = idle.pop()
+            break
+          if self._size < self.max_size or self._retire_foreign_idle():
+            self._size += 1
+            conn = None
+            break
+          remaining = deadline - time.monotonic()
+          if remaining <= 0:
+            raise PoolTimeout(
+              f"No connection to {self.database} available within {timeout}s.")
+          self.waits += 1
+          self._cond.wait(remaining)
+      if conn is None:
+        try:
+          conn = self._open()
+        except BaseException:
+          self._forget()
+          raise
+      elif not self._healthy(conn):
+        self._discard(conn)
+        continue
+      with self._cond:
+        self.checkouts += 1
+      _lent[id(conn)] = self
+      return conn
+
+  def release(self, conn, discard=False):
+    """Return a borrowed connection; discard=True closes it instead."""
+    _lent.pop(id(conn), None)
+    if discard:
+      self._discard(conn)
+      return
+    with self._cond:
+      self._idle.setdefault(self._owner(), []).append(conn)
+      self._cond.notify()
+
+  def _discard(self, conn):
+    try:
+      conn.close()
+    except sqlite3.Error:
+      pass
+    self._forget()
+
+  def _forget(self):
+    with self._cond:
+      self._size -= 1
+      self.discarded += 1
+      self._cond.notify()
+
+  @contextmanager
+  def connection(self, timeout=None):
+    """Lend a connection, committing on success and rolling back on error."""
+    conn = self.acquire(timeout)
+    try:
+      yield conn
+      conn.commit()
+    except BaseException:
+      try:
+        conn.rollback()
+      except sqlite3.Error:
+        self.release(conn, discard=True)
+      else:
+        self.release(conn)
+      raise
+    self.release(conn)
+
+  def close(self):
+    """Close the idle connections this thread is allowed to close."""
+    with self._cond:
+      owners = [owner for owner in self._idle
+                if owner is None or owner == threading.get_ident()]
+      conns = [conn for owner in owners for conn in self._idle.pop(owner)]
+      self._size -= len(conns)
+      self._cond.notify_all()
+    for conn in conns:
+      conn.close()
+
+  def stats(self):
+    with self._cond:
+      return {
+        'size': self._size,
+        'idle': sum(len(conns) for conns in self._idle.values()),
+        'checkouts': self.checkouts,
+        'created': self.created,
+        'discarded': self.discarded,
+        'waits': self.waits,
+      }
+
+
+_pools = {}
+_pools_lock = threading.Lock()
+
+
+def get_pool(database=DATABASE, **options):
+  """Return the shared pool for database and options, creating it on first use."""
+  options = {name: value for name, value in options.items() if value is not None}
+  key = (database, tuple(sorted(options.items())))
+  with _pools_lock:
+    pool = _pools.get(key)
+    if pool is None:
+      pool = _pools[key] = ConnectionPool(database, **options)
+    return pool
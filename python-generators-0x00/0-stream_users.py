@@ -1,15 +1,62 @@
 import seed
 
 
+class UserRow:
+    """Lightweight, dict-free record for a single user_data row."""
+    __slots__ = ('user_id', 'name', 'email', 'age')
+
+    def __init__(self, user_id, name, email, age):
+        self.user_id = user_id
+        self.name = name
+        self.email = email
+        self.age = age
+
+    def __repr__(self):
+        return (f"UserRow(user_id={self.user_id!r}, name={self.name!r}, "
+                f"email={self.email!r}, age={self.age!r})")
+
+
 def stream_users():
     """Generator function that yields user data from a list of users in the db"""
-    connection = seed.connect_to_prodev()
-    if connection:
-        cursor = connection.cursor(dictionary=True)
+    connection = seed.connect_from_pool()
+    if not connection:
+        raise Exception("Failed to connect to the database.")
+    cursor = connection.cursor(dictionary=True)
+    try:
         cursor.execute("SELECT * FROM user_data;")
         for row in cursor:
             yield row
-        cursor.close()
-        connection.close()
-    else:
+    finally:
+        # Also runs when the consumer stops early (e.g. islice), so the
+        # connection always goes back to the pool.
+        seed.close_stream(connection, cursor)
+
+
+def stream_user_rows(as_tuples=False, chunk_size=1000):
+    """Stream user_data with bounded memory.
+
+    Rows are read through an unbuffered cursor, chunk_size at a time, so the
+    client never holds more than one chunk. Yields UserRow records, or plain
+    tuples when as_tuples is True.
+
+    Stopping early kills the statement server side (seed.close_stream), so
+    only the rows already in flight are read before the connection goes
+    back to the pool, not the rest of the table.
+    """
+    connection = seed.connect_from_pool()
+    if not connection:
         raise Exception("Failed to connect to the database.")
+    cursor = connection.cursor(buffered=False)
+    try:
+        cursor.execute("SELECT user_id, name, email, age FROM user_data;")
+        while True:
+            rows = cursor.fetchmany(chunk_size)
+            if not rows:
+                break
+            if as_tuples:
+                yield from rows
+            else:
+                for row in rows:
+                    yield UserRow(*row)
+    finally:
+        seed.close_stream(connection, cursor)
@@ -1,31 +1,192 @@
+import queue
+import threading
+from array import array
+from itertools import compress
+
 import seed
 
-def stream_users_in_batches(batch_size):
-    """Stream user data in batches using a single database connection."""
+try:
+    import numpy as np
+except ImportError:  # columnar mode falls back to the stdlib array module
+    np = None
+
+NUMERIC_COLUMNS = ('age',)
+USER_COLUMNS = ('user_id', 'name', 'email', 'age')
+OPERATORS = ('=', '!=', '<', '<=', '>', '>=', 'IN', 'LIKE')
+
+
+def build_user_query(columns=None, where=None):
+    """Compile a projection and predicate spec into parameterized SQL.
+
+    columns is a sequence of user_data column names (default: all) and where
+    a sequence of (column, operator, value) tuples that are ANDed together,
+    e.g. [('age', '>', 25)]. Column names and operators are checked against
+    whitelists; values are always bound as parameters.
+    """
+    columns = tuple(columns) if columns else USER_COLUMNS
+    for column in columns:
+        if column not in USER_COLUMNS:
+            raise ValueError(f"Unknown user_data column: {column}")
+    clauses = []
+    params = []
+    for column, operator, value in where or ():
+        operator = operator.upper()
+        if column not in USER_COLUMNS:
+            raise ValueError(f"Unknown user_data column: {column}")
+        if operator not in OPERATORS:
+            raise ValueError(f"Unsupported operator: {operator}")
+        if operator == 'IN':
+            values = list(value)
+            if not values:
+                raise ValueError(f"Empty IN list for column: {column}")
+            clauses.append(f"{column} IN ({', '.join(['%s'] * len(values))})")
+            params.extend(values)
+        else:
+            clauses.append(f"{column} {operator} %s")
+            params.append(value)
+    query = f"SELECT {', '.join(columns)} FROM user_data"
+    if clauses:
+        query += " WHERE " + " AND ".join(clauses)
+    return query + ";", tuple(params)
+
+
+def _to_columns(column_names, batch):
+    """Transpose a batch of row tuples into {column: values}.
+
+    Numeric columns become float64 NumPy arrays (or array('d') without
+    NumPy); the rest become object arrays (or lists).
+    """
+    columns = {}
+    for name, values in zip(column_names, zip(*batch)):
+        if name in NUMERIC_COLUMNS:
+            columns[name] = np.array(values, dtype=np.float64) if np else array('d', values)
+        else:
+            columns[name] = np.array(values, dtype=object) if np else list(values)
+    return columns
+
+
+def column_mask(values, threshold):
+    """Boolean mask of values > threshold for one column."""
+    if np is not None:
+        return values > threshold
+    return [value > threshold for value in values]
+
+
+def select_rows(columns, mask):
+    """Keep only the rows of a columnar batch where mask is true."""
+    if np is not None:
+        return {name: values[mask] for name, values in columns.items()}
+    return {name: list(compress(values, mask)) for name, values in columns.items()}
+
+
+def iter_column_rows(columns):
+    """Yield the rows of a columnar batch back as dicts."""
+    names = list(columns)
+    for values in zip(*(columns[name] for name in names)):
+        yield dict(zip(names, values))
+
+
+def stream_users_in_batches(batch_size, columnar=False, columns=None, where=None):
+    """Stream user data in batches using a single database connection.
+
+    With columnar=True each batch is a dict of column arrays instead of a
+    list of row dicts, so filters can run as vectorized masks. columns and
+    where are pushed down to the server (see build_user_query), so only the
+    selected rows and columns are transferred.
+    """
+    query, params = build_user_query(columns, where)
     connection = seed.connect_to_prodev()
     if not connection:
         raise Exception("Failed to connect to the database.")
-    
+
     try:
-        cursor = connection.cursor(dictionary=True)
-        cursor.execute("SELECT * FROM user_data;")
-        
+        cursor = connection.cursor(dictionary=not columnar)
+        cursor.execute(query, params)
+
         while True:
             batch = cursor.fetchmany(batch_size)
             if not batch:
                 break
-            yield batch
+            if columnar:
+                yield _to_columns(cursor.column_names, batch)
+            else:
+                yield batch
     finally:
         cursor.close()
         connection.close()
     return
 
-def batch_processing(batch_size):
-    """Process user data in batches."""
-    for batch in stream_users_in_batches(batch_size):
-        print(f"Processing batch of size {len(batch)}")
-        for user in batch:
-          if int(user['age']) > 25:
-            print(user)
+_DONE = object()
+
+
+def prefetch(iterable, depth=2):
+    """Iterate `iterable` on a background thread, up to `depth` items ahead.
+
+    Items are handed over through a bounded queue, so the producer (e.g. a
+    cursor waiting on fetchmany) runs while the consumer works on the
+    previous item. Exceptions from the producer are re-raised in the
+    consumer. Closing the returned generator stops the producer.
+    """
+    handoff = queue.Queue(maxsize=max(depth, 1))
+    stop = threading.Event()
+
+    def put(item):
+        while not stop.is_set():
+            try:
+                handoff.put(item, timeout=0.1)
+                return True
+            except queue.Full:
+                continue
+        return False
+
+    def produce():
+        iterator = iter(iterable)
+        try:
+            for item in iterator:
+                if not put((item, None)):
+                    break
+            else:
+                put((_DONE, None))
+        except BaseException as e:
+            put((_DONE, e))
+        finally:
+            # Close here so the source is cleaned up on the thread that ran it.
+            close = getattr(iterator, 'close', None)
+            if close is not None:
+                close()
+
+    worker = threading.Thread(target=produce, name="batch-prefetch", daemon=True)
+    worker.start()
+    try:
+        while True:
+            item, error = handoff.get()
+            if error is not None:
+                raise error
+            if item is _DONE:
+                break
+            yield item
+    finally:
+        stop.set()
+        worker.join()
+
+
+def batch_processing(batch_size, columnar=False, prefetch_depth=0):
+    """Process user data in batches, keeping users older than 25.
+
+    prefetch_depth > 0 fetches that many batches ahead on a background thread.
+    """
+    where = [('age', '>', 25)]
+    batches = stream_users_in_batches(batch_size, columnar=columnar, where=where)
+    if prefetch_depth > 0:
+        batches = prefetch(batches, prefetch_depth)
+    for batch in batches:
+        if columnar:
+            print(f"Processing batch of size {len(batch['age'])}")
+            for user in iter_column_rows(batch):
+                print(user)
+        else:
+            print(f"Processing batch of size {len(batch)}")
+            for user in batch:
+                print(user)
         print("Batch processed successfully.")
-    return
\ No newline at end of file
+    return
@@ -1,7 +1,8 @@
+import base64
 import seed
 
 def paginate_users(page_size, offset):
-    connection = seed.connect_to_prodev()
+    connection = seed.connect_from_pool()
     cursor = connection.cursor(dictionary=True)
     cursor.execute(f"SELECT * FROM user_data LIMIT {page_size} OFFSET {offset}")
     rows = cursor.fetchall()
@@ -9,8 +10,60 @@ def paginate_users(page_size, offset):
     connection.close()
     return rows
 
-def lazy_paginate(page_size):
-    """Generator function that yields user data in pages."""
+def paginate_users_after(page_size, last_user_id=None):
+    """Fetch the page that follows last_user_id, seeking on the primary key."""
+    connection = seed.connect_from_pool()
+    cursor = connection.cursor(dictionary=True)
+    if last_user_id is None:
+        cursor.execute(
+            "SELECT * FROM user_data ORDER BY user_id LIMIT %s", (page_size,))
+    else:
+        cursor.execute(
+            "SELECT * FROM user_data WHERE user_id > %s ORDER BY user_id LIMIT %s",
+            (last_user_id, page_size))
+    rows = cursor.fetchall()
+    cursor.close()
+    connection.close()
+    return rows
+
+def encode_cursor(user_id):
+    """Turn the last seen user_id into an opaque resume token."""
+    return base64.urlsafe_b64encode(user_id.encode()).decode()
+
+def decode_cursor(token):
+    """Recover the user_id stored in a resume token."""
+    try:
+        user_id = base64.b64decode(token.encode(), altchars=b'-_', validate=True).decode()
+    except (ValueError, UnicodeDecodeError) as e:
+        raise ValueError(f"Invalid pagination cursor: {token!r}") from e
+    if not user_id:
+        raise ValueError(f"Invalid pagination cursor: {token!r}")
+    return user_id
+
+def next_cursor(page):
+    """Resume token pointing just past the given page, or None if it is empty."""
+    if not page:
+        return None
+    return encode_cursor(page[-1]['user_id'])
+
+def lazy_paginate(page_size, keyset=False, cursor=None):
+    """Generator function that yields user data in pages.
+
+    With keyset=True pages are fetched with WHERE user_id > last_seen instead
+    of OFFSET, so every page costs the same no matter how deep the walk is.
+    Pass a token from next_cursor() as cursor to resume a keyset walk.
+    """
+    if keyset:
+        last_user_id = decode_cursor(cursor) if cursor else None
+        while True:
+            page = paginate_users_after(page_size, last_user_id)
+            if not page:
+                break
+            yield page
+            last_user_id = page[-1]['user_id']
+        return
+    if cursor is not None:
+        raise ValueError("cursor is only supported with keyset=True")
     offset = 0
     while True:
         page = paginate_users(page_size, offset)
@@ -18,4 +71,4 @@ def lazy_paginate(page_size):
             break
         yield page
         offset += page_size
-    return
\ No newline at end of file
+    return
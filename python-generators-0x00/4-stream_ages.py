@@ -1,5 +1,14 @@
+import math
+from array import array
+
+import mysql.connector
 import seed
 
+try:
+    import numpy as np
+except ImportError:  # chunk statistics fall back to the stdlib array module
+    np = None
+
 def stream_user_ages():
     """Generator function that yields user ages from the database."""
     connection = seed.connect_to_prodev()
@@ -21,14 +30,99 @@ def stream_ages():
     return
   
   
+def _chunk_stats(rows):
+    """count, sum, mean, sum of squared deviations (M2), min and max of one chunk of (age,) rows."""
+    if np is not None:
+        values = np.array(rows, dtype=np.float64).ravel()
+        n = values.size
+        total = float(values.sum())
+        return n, total, total / n, float(values.var()) * n, float(values.min()), float(values.max())
+    values = array('d', [row[0] for row in rows])
+    n = len(values)
+    total = math.fsum(values)
+    mean = total / n
+    m2 = math.fsum((v - mean) ** 2 for v in values)
+    return n, total, mean, m2, min(values), max(values)
+
+
+def _age_stats_streaming(chunk_size):
+    """Welford/Chan running statistics over fetchmany chunks of ages."""
+    connection = seed.connect_to_prodev()
+    if not connection:
+        raise Exception("Failed to connect to the database.")
+    cursor = connection.cursor()
+    count, total_sum, mean, m2 = 0, 0.0, 0.0, 0.0
+    low, high = None, None
+    try:
+        cursor.execute("SELECT age FROM user_data;")
+        while True:
+            rows = cursor.fetchmany(chunk_size)
+            if not rows:
+                break
+            n, chunk_sum, chunk_mean, chunk_m2, chunk_low, chunk_high = _chunk_stats(rows)
+            total = count + n
+            delta = chunk_mean - mean
+            mean += delta * n / total
+            m2 += chunk_m2 + delta * delta * count * n / total
+            count = total
+            total_sum += chunk_sum
+            low = chunk_low if low is None else min(low, chunk_low)
+            high = chunk_high if high is None else max(high, chunk_high)
+    finally:
+        cursor.close()
+        connection.close()
+    return {
+        'count': count,
+        'sum': total_sum,
+        'mean': mean if count else 0,
+        'min': low,
+        'max': high,
+        'variance': m2 / count if count else 0,
+    }
+
+
+def _age_stats_pushdown():
+    """Let MySQL aggregate the ages and return only the summary row."""
+    connection = seed.connect_to_prodev()
+    if not connection:
+        raise Exception("Failed to connect to the database.")
+    cursor = connection.cursor()
+    try:
+        cursor.execute(
+            "SELECT COUNT(age), SUM(age), AVG(age), MIN(age), MAX(age), VAR_POP(age) "
+            "FROM user_data;")
+        count, total, mean, low, high, variance = cursor.fetchone()
+    finally:
+        cursor.close()
+        connection.close()
+    return {
+        'count': count,
+        'sum': float(total or 0),
+        'mean': float(mean or 0),
+        'min': float(low) if low is not None else None,
+        'max': float(high) if high is not None else None,
+        'variance': float(variance or 0),
+    }
+
+
+def age_stats(pushdown=True, chunk_size=10000):
+    """count, sum, mean, min, max and population variance of user ages.
+
+    Aggregates in SQL when pushdown is True, falling back to streaming the
+    ages in chunk_size batches if the query fails or pushdown is disabled.
+    """
+    if pushdown:
+        try:
+            return _age_stats_pushdown()
+        except mysql.connector.Error as err:
+            print(f"Aggregate query failed, streaming ages instead: {err}")
+    return _age_stats_streaming(chunk_size)
+
+
 def average_age():
     """Calculate the average age of users."""
-    total_age = 0
-    count = 0
-    for age in stream_ages():
-        total_age += age
-        count += 1
-    if count == 0:
+    stats = age_stats()
+    if stats['count'] == 0:
         return 0
-    print(f"Average age of users: {total_age / count}")
-    return total_age / count
\ No newline at end of file
+    print(f"Average age of users: {stats['mean']}")
+    return stats['mean']
@@ -0,0 +1,126 @@
+import asyncio
+from contextlib import aclosing
+
+import seed
+
+
+async def _fetch_batches(cursor, batch_size, prefetch=True):
+    """Yield fetchmany batches, fetching batch N+1 while batch N is consumed."""
+    pending = asyncio.ensure_future(cursor.fetchmany(batch_size))
+    try:
+        while True:
+            batch = await pending
+            pending = None
+            if not batch:
+                return
+            if prefetch:
+                pending = asyncio.ensure_future(cursor.fetchmany(batch_size))
+                yield batch
+            else:
+                yield batch
+                pending = asyncio.ensure_future(cursor.fetchmany(batch_size))
+    finally:
+        if pending is not None and not pending.done():
+            pending.cancel()
+            try:
+                await pending
+            except asyncio.CancelledError:
+                pass
+
+
+async def _astream_query(query, params=(), batch_size=100, prefetch=True, dictionary=True):
+    """Run query on a pooled connection and yield its result in batches."""
+    async with seed.get_async_pool().connection() as connection:
+        cursor = await connection.cursor(dictionary=dictionary)
+        await cursor.execute(query, params)
+        async with aclosing(_fetch_batches(cursor, batch_size, prefetch)) as batches:
+            async for batch in batches:
+                yield batch
+        await cursor.close()
+
+
+async def astream_users(batch_size=100, prefetch=True):
+    """Async generator that yields user rows from the db one at a time."""
+    async with aclosing(_astream_query("SELECT * FROM user_data;",
+                                       batch_size=batch_size, prefetch=prefetch)) as batches:
+        async for batch in batches:
+            for row in batch:
+                yield row
+
+
+async def astream_users_in_batches(batch_size, prefetch=True):
+    """Async generator that yields lists of user rows of up to batch_size."""
+    async with aclosing(_astream_query("SELECT * FROM user_data;",
+                                       batch_size=batch_size, prefetch=prefetch)) as batches:
+        async for batch in batches:
+            yield batch
+
+
+async def abatch_processing(batch_size):
+    """Print users older than 25, overlapping the next fetch with printing."""
+    async for batch in astream_users_in_batches(batch_size):
+        print(f"Processing batch of size {len(batch)}")
+        for user in batch:
+            if int(user['age']) > 25:
+                print(user)
+        print("Batch processed successfully.")
+
+
+async def apaginate_users_after(page_size, last_user_id=None):
+    """Fetch the keyset page that follows last_user_id."""
+    async with seed.get_async_pool().connection() as connection:
+        cursor = await connection.cursor(dictionary=True)
+        if last_user_id is None:
+            await cursor.execute(
+                "SELECT * FROM user_data ORDER BY user_id LIMIT %s", (page_size,))
+        else:
+            await cursor.execute(
+                "SELECT * FROM user_data WHERE user_id > %s ORDER BY user_id LIMIT %s",
+                (last_user_id, page_size))
+        rows = await cursor.fetchall()
+        await cursor.close()
+        return rows
+
+
+async def alazy_paginate(page_size, prefetch=True):
+    """Async generator that yields keyset pages, requesting the next one early."""
+    page = await apaginate_users_after(page_size)
+    while page:
+        pending = None
+        if prefetch and len(page) == page_size:
+            pending = asyncio.ensure_future(
+                apaginate_users_after(page_size, page[-1]['user_id']))
+        try:
+            yield page
+        except BaseException:
+            if pending is not None:
+                pending.cancel()
+            raise
+        if pending is not None:
+            page = await pending
+        elif len(page) == page_size:
+            page = await apaginate_users_after(page_size, page[-1]['user_id'])
+        else:
+            page = []
+
+
+async def astream_user_ages(batch_size=1000, prefetch=True):
+    """Async generator that yields user ages."""
+    async with aclosing(_astream_query("SELECT age FROM user_data;", batch_size=batch_size,
+                                       prefetch=prefetch, dictionary=False)) as batches:
+        async for batch in batches:
+            for (age,) in batch:
+                yield age
+
+
+async def aaverage_age():
+    """Calculate the average age of users without blocking the event loop."""
+    total_age = 0
+    count = 0
+    async for age in astream_user_ages():
+        total_age += age
+        count += 1
+    if count == 0:
+        return 0
+    print(f"Average age of users: {total_age / count}")
+    return total_age / count
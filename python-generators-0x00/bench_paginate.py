@@ -0,0 +1,60 @@
+#!/usr/bin/python3
+"""Compare page-fetch latency of OFFSET and keyset pagination.
+
+Usage: ./bench_paginate.py [page_size] [repeats]
+
+Needs user_data seeded with at least page_size * 10,000 rows for the
+deepest checkpoint; shallower checkpoints are skipped past the table end.
+"""
+import sys
+import time
+
+import seed
+
+paginate = __import__('2-lazy_paginate')
+
+PAGES = (1, 10, 100, 1000, 10000)
+
+
+def boundary_user_id(page_size, page):
+    """user_id of the last row before the given 1-based page (untimed setup)."""
+    if page == 1:
+        return None
+    connection = seed.connect_to_prodev()
+    cursor = connection.cursor()
+    cursor.execute(
+        "SELECT user_id FROM user_data ORDER BY user_id LIMIT 1 OFFSET %s",
+        ((page - 1) * page_size - 1,))
+    row = cursor.fetchone()
+    cursor.close()
+    connection.close()
+    return row[0] if row else None
+
+
+def best_of(repeats, fn, *args):
+    best = float('inf')
+    for _ in range(repeats):
+        start = time.perf_counter()
+        rows = fn(*args)
+        best = min(best, time.perf_counter() - start)
+    return best, len(rows)
+
+
+def main():
+    page_size = int(sys.argv[1]) if len(sys.argv) > 1 else 100
+    repeats = int(sys.argv[2]) if len(sys.argv) > 2 else 5
+    print(f"{'page':>8} {'offset ms':>12} {'keyset ms':>12}")
+    for page in PAGES:
+        last_user_id = boundary_user_id(page_size, page)
+        if page > 1 and last_user_id is None:
+            print(f"{page:>8} (past end of table, skipped)")
+            continue
+        offset_s, _ = best_of(repeats, paginate.paginate_users,
+                              page_size, (page - 1) * page_size)
+        keyset_s, _ = best_of(repeats, paginate.paginate_users_after,
+                              page_size, last_user_id)
+        print(f"{page:>8} {offset_s * 1000:>12.2f} {keyset_s * 1000:>12.2f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,45 @@
+#!/usr/bin/python3
+"""Report peak RSS while streaming user_data.
+
+Usage: ./bench_stream_memory.py [dict|rows|tuples] [limit]
+
+Run each mode in its own process; peak RSS is per process. Seed 10M rows
+(see seed.insert_data) to reproduce the constant-memory claim for the
+unbuffered modes.
+"""
+import resource
+import sys
+import time
+from itertools import islice
+
+stream = __import__('0-stream_users')
+
+
+def peak_rss_mb():
+    # ru_maxrss is kilobytes on Linux and bytes on macOS.
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak / (1024 * 1024) if sys.platform == 'darwin' else peak / 1024
+
+
+def main():
+    mode = sys.argv[1] if len(sys.argv) > 1 else 'rows'
+    limit = int(sys.argv[2]) if len(sys.argv) > 2 else None
+    if mode == 'dict':
+        rows = stream.stream_users()
+    elif mode == 'tuples':
+        rows = stream.stream_user_rows(as_tuples=True)
+    else:
+        rows = stream.stream_user_rows()
+    start_rss = peak_rss_mb()
+    start = time.perf_counter()
+    count = 0
+    for count, _ in enumerate(islice(rows, limit), 1):
+        if count % 1_000_000 == 0:
+            print(f"{count:>12,} rows  peak RSS {peak_rss_mb():.1f} MB")
+    elapsed = time.perf_counter() - start
+    print(f"mode={mode} rows={count:,} elapsed={elapsed:.1f}s "
+          f"peak RSS {start_rss:.1f} -> {peak_rss_mb():.1f} MB")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,8 +1,14 @@
+import asyncio
 import os
+from contextlib import asynccontextmanager
+
 import mysql.connector
-from mysql.connector import errorcode
+from mysql.connector import errorcode, pooling
+from mysql.connector.aio import connect as aio_connect
 from dotenv import load_dotenv
 import csv
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
 import uuid as UUID
 
 load_dotenv("../.env")
@@ -19,7 +25,7 @@ def validate_env():
         return True
 
 
-def connect_db():
+def connect_db(allow_local_infile=False):
     connection = None
     try:
         if validate_env():
@@ -28,6 +34,7 @@ def connect_db():
                 host=os.getenv('DB_HOST'),
                 user=os.getenv('DB_USER'),
                 password=os.getenv('DB_PASSWORD'),
+                allow_local_infile=allow_local_infile,
             )
             print("Connection established successfully.")
             print(f"Connected: {connection.is_connected()}")
@@ -53,8 +60,8 @@ def create_database(connection):
         print(f"Failed creating database: {err}")
 
 
-def connect_to_prodev():
-    connection = connect_db()
+def connect_to_prodev(allow_local_infile=False):
+    connection = connect_db(allow_local_infile)
     if connection:
         try:
             print("Connecting to ALX_prodev database...")
@@ -67,6 +74,181 @@ def connect_to_prodev():
         print("Failed to connect to the database server.")
 
 
+_pool = None
+
+
+def get_pool():
+    """Return the shared ALX_prodev connection pool, creating it on first use."""
+    global _pool
+    if _pool is None:
+        validate_env()
+        print("Creating ALX_prodev connection pool...")
+        _pool = pooling.MySQLConnectionPool(
+            pool_name="alx_prodev",
+            pool_size=int(os.getenv('DB_POOL_SIZE', 5)),
+            pool_reset_session=True,
+            host=os.getenv('DB_HOST'),
+            user=os.getenv('DB_USER'),
+            password=os.getenv('DB_PASSWORD'),
+            database='ALX_prodev',
+        )
+    return _pool
+
+
+def connect_from_pool():
+    """Check out a pooled ALX_prodev connection; close() hands it back."""
+    try:
+        return get_pool().get_connection()
+    except mysql.connector.Error as err:
+        print(f"Failed to get a pooled connection: {err}")
+
+
+def kill_query(connection_id):
+    """Stop the statement running on connection_id from a separate connection."""
+    killer = mysql.connector.connect(
+        host=os.getenv('DB_HOST'),
+        user=os.getenv('DB_USER'),
+        password=os.getenv('DB_PASSWORD'),
+    )
+    try:
+        cursor = killer.cursor()
+        cursor.execute(f"KILL QUERY {int(connection_id)}")
+        cursor.close()
+    finally:
+        killer.close()
+
+
+def close_stream(connection, cursor):
+    """Close a cursor and connection that may still be streaming an unbuffered result.
+
+    When the consumer stopped early, the statement is killed server side so
+    only the rows already in flight are read off the socket, not the rest
+    of the table. A connection that cannot be cleaned up is disconnected;
+    a pool reconnects it on its next checkout.
+    """
+    try:
+        if connection.unread_result:
+            kill_query(connection.connection_id)
+            try:
+                connection.consume_results()
+            except mysql.connector.Error:
+                pass  # the killed statement ends with ER_QUERY_INTERRUPTED
+        cursor.close()
+    except mysql.connector.Error as err:
+        print(f"Failed to stop the stream cleanly, dropping its connection: {err}")
+        connection.disconnect()
+    try:
+        # For pooled connections close() resets the session and hands them back.
+        connection.close()
+    except mysql.connector.Error as err:
+        print(f"Failed to release the connection: {err}")
+
+
+class AsyncPool:
+    """Small asyncio connection pool over mysql.connector.aio.
+
+    At most `size` connections are checked out at once; idle ones are kept
+    for reuse. A pool belongs to the event loop it was first used on; close
+    it (close_async_pool() for the shared one) before that loop ends.
+    """
+
+    def __init__(self, size=5, **config):
+        self.size = size
+        self._config = config
+        self._idle = []
+        self._slots = None
+        self.loop = None
+
+    async def acquire(self):
+        if self._slots is None:
+            self._slots = asyncio.Semaphore(self.size)
+            self.loop = asyncio.get_running_loop()
+        await self._slots.acquire()
+        try:
+            while self._idle:
+                connection = self._idle.pop()
+                if await connection.is_connected():
+                    return connection
+            return await aio_connect(**self._config)
+        except BaseException:
+            self._slots.release()
+            raise
+
+    async def release(self, connection, discard=False):
+        """Return a connection; discard=True closes it instead of keeping it.
+
+        A kept connection is rolled back first: autocommit is off, so
+        otherwise its read snapshot would outlive the borrower and later
+        queries on it would see stale rows.
+        """
+        try:
+            if not discard:
+                try:
+                    await connection.rollback()
+                except mysql.connector.Error:
+                    discard = True
+            if discard:
+                await connection.close()
+            else:
+                self._idle.append(connection)
+        finally:
+            self._slots.release()
+
+    @asynccontextmanager
+    async def connection(self):
+        connection = await self.acquire()
+        try:
+            yield connection
+        except BaseException:
+            await self.release(connection, discard=True)
+            raise
+        await self.release(connection)
+
+    async def close(self):
+        while self._idle:
+            await self._idle.pop().close()
+
+
+_async_pool = None
+
+
+def get_async_pool():
+    """Return the shared async ALX_prodev pool for the running event loop."""
+    global _async_pool
+    loop = asyncio.get_running_loop()
+    if _async_pool is None or _async_pool.loop not in (None, loop):
+        if _async_pool is not None:
+            _retire_async_pool(_async_pool)
+        validate_env()
+        _async_pool = AsyncPool(
+            size=int(os.getenv('DB_POOL_SIZE', 5)),
+            host=os.getenv('DB_HOST'),
+            user=os.getenv('DB_USER'),
+            password=os.getenv('DB_PASSWORD'),
+            database='ALX_prodev',
+        )
+    return _async_pool
+
+
+def _retire_async_pool(pool):
+    """Close the idle connections of a pool whose event loop is being left behind."""
+    if pool.loop.is_running():
+        asyncio.run_coroutine_threadsafe(pool.close(), pool.loop)
+    elif pool._idle:
+        # Its loop has ended, so the connections can no longer be closed
+        # cleanly; close_async_pool() should have run before that.
+        print(f"Dropping {len(pool._idle)} idle connections from a finished event loop.")
+        pool._idle.clear()
+
+
+async def close_async_pool():
+    """Close the shared async pool; call it before the event loop ends."""
+    global _async_pool
+    if _async_pool is not None and _async_pool.loop in (None, asyncio.get_running_loop()):
+        pool, _async_pool = _async_pool, None
+        await pool.close()
+
+
 def create_table(connection):
     cursor = connection.cursor()
     try:
@@ -101,8 +283,183 @@ def insert_data(connection, data_file):
         connection.rollback()
 
 
+INSERT_USER_QUERY = "INSERT IGNORE INTO user_data (user_id, name, email, age) VALUES (%s, %s, %s, %s)"
+
+
+def report_progress(count, started):
+    elapsed = time.perf_counter() - started
+    rate = count / elapsed if elapsed else 0
+    print(f"{count} records processed ({rate:,.0f} rows/sec).")
+
+
+def insert_data_batched(connection, data_file, batch_size=1000, commit_every=50):
+    """Seed user_data in multi-row INSERTs of batch_size rows.
+
+    executemany rewrites the batch into a single INSERT ... VALUES (...), (...)
+    statement, so each batch costs one round trip. Commits every commit_every
+    batches to keep transactions (and undo logs) bounded.
+    """
+    cursor = connection.cursor()
+    count = 0
+    batches = 0
+    started = time.perf_counter()
+    try:
+        batch = []
+        for user in csv_user_generator(data_file):
+            batch.append((UUID.uuid4().hex, user['name'], user['email'], user['age']))
+            if len(batch) >= batch_size:
+                cursor.executemany(INSERT_USER_QUERY, batch)
+                count += len(batch)
+                batches += 1
+                batch = []
+                if batches % commit_every == 0:
+                    connection.commit()
+                    report_progress(count, started)
+        if batch:
+            cursor.executemany(INSERT_USER_QUERY, batch)
+            count += len(batch)
+        connection.commit()
+        report_progress(count, started)
+    except mysql.connector.Error as err:
+        print(f"Failed inserting data: {err}")
+        connection.rollback()
+    finally:
+        cursor.close()
+    return count
+
+
+def load_data_infile(connection, data_file):
+    """Seed user_data with LOAD DATA LOCAL INFILE.
+
+    The connection must be opened with allow_local_infile=True and the server
+    must have local_infile enabled. user_id is generated server side.
+    """
+    cursor = connection.cursor()
+    started = time.perf_counter()
+    try:
+        cursor.execute("""
+            LOAD DATA LOCAL INFILE %s IGNORE INTO TABLE user_data
+            FIELDS TERMINATED BY ',' OPTIONALLY ENCLOSED BY '"'
+            LINES TERMINATED BY '\\n'
+            IGNORE 1 LINES
+            (name, email, age)
+            SET user_id = UUID()
+        """, (os.path.abspath(data_file),))
+        count = cursor.rowcount
+        connection.commit()
+        report_progress(count, started)
+        return count
+    except mysql.connector.Error as err:
+        print(f"Failed loading data: {err}")
+        connection.rollback()
+        return 0
+    finally:
+        cursor.close()
+
+
 def csv_user_generator(csv_file):
     with open(csv_file, 'r') as f:
         reader = csv.DictReader(f)
         for row in reader:
             yield row
+
+
+def split_csv(csv_file, parts):
+    """Split csv_file into up to `parts` byte ranges that start on line boundaries.
+
+    Returns (fieldnames, ranges) where ranges is a list of (start, end) offsets
+    covering every data line exactly once. Assumes no quoted field contains
+    a newline, which holds for user_data.csv.
+    """
+    size = os.path.getsize(csv_file)
+    with open(csv_file, 'rb') as f:
+        header = f.readline()
+        data_start = f.tell()
+        boundaries = [data_start]
+        step = max((size - data_start) // max(parts, 1), 1)
+        for i in range(1, parts):
+            f.seek(max(data_start + i * step, boundaries[-1]))
+            f.readline()
+            position = min(f.tell(), size)
+            if position > boundaries[-1]:
+                boundaries.append(position)
+        if boundaries[-1] < size:
+            boundaries.append(size)
+    fieldnames = next(csv.reader([header.decode('utf-8')]))
+    return fieldnames, list(zip(boundaries, boundaries[1:]))
+
+
+def csv_range_generator(csv_file, fieldnames, start, end):
+    """Yield dict rows for the data lines in the byte range [start, end)."""
+    with open(csv_file, 'rb') as f:
+        f.seek(start)
+
+        def lines():
+            while f.tell() < end:
+                line = f.readline()
+                if not line:
+                    break
+                yield line.decode('utf-8')
+
+        for row in csv.DictReader(lines(), fieldnames=fieldnames):
+            yield row
+
+
+def _ingest_range(job):
+    """Process-pool worker: load one byte range through its own connection."""
+    csv_file, fieldnames, start, end, batch_size = job
+    connection = connect_to_prodev()
+    if not connection:
+        raise Exception("Failed to connect to the database.")
+    cursor = connection.cursor()
+    count = 0
+    started = time.perf_counter()
+    try:
+        batch = []
+        for user in csv_range_generator(csv_file, fieldnames, start, end):
+            batch.append((UUID.uuid4().hex, user['name'], user['email'], user['age']))
+            if len(batch) >= batch_size:
+                cursor.executemany(INSERT_USER_QUERY, batch)
+                connection.commit()
+                count += len(batch)
+                batch = []
+        if batch:
+            cursor.executemany(INSERT_USER_QUERY, batch)
+            connection.commit()
+            count += len(batch)
+    except mysql.connector.Error as err:
+        print(f"Worker {os.getpid()} failed inserting data: {err}")
+        connection.rollback()
+    finally:
+        cursor.close()
+        connection.close()
+    return os.getpid(), count, time.perf_counter() - started
+
+
+def parallel_insert_data(data_file, workers=None, batch_size=1000):
+    """Seed user_data by parsing and inserting byte ranges of data_file in parallel.
+
+    Each worker process parses its own slice of the file and writes through
+    its own connection; per-worker throughput is printed as workers finish.
+    A worker that hits an error rolls back its open batch and reports it
+    without stopping the others.
+    """
+    workers = workers or os.cpu_count() or 1
+    fieldnames, ranges = split_csv(data_file, workers)
+    jobs = [(data_file, fieldnames, start, end, batch_size) for start, end in ranges]
+    total = 0
+    started = time.perf_counter()
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        futures = {executor.submit(_ingest_range, job): job for job in jobs}
+        for future in as_completed(futures):
+            try:
+                pid, count, elapsed = future.result()
+            except Exception as e:
+                _, _, start, end, _ = futures[future]
+                print(f"Worker for bytes {start}-{end} failed: {e}")
+                continue
+            rate = count / elapsed if elapsed else 0
+            print(f"Worker {pid}: {count} records in {elapsed:.2f}s ({rate:,.0f} rows/sec).")
+            total += count
+    report_progress(total, started)
+    return total